@@ -6,9 +6,39 @@ import sys
 import os.path
 import math
 import fnmatch
+import re
+import ConfigParser
+import cStringIO
+import cPickle
+import hashlib
+import tempfile
+import shutil
+from collections import OrderedDict
 import itertools
+import functools
+import glob
+import traceback
+import multiprocessing
+import mmap
 import copy
+import json
+import time
+import io
+import gzip
+import bz2
+from timeit import default_timer as timer
 from string import digits
+try:
+    import resource
+except ImportError:
+    resource = None                         # no peak memory in --profile (windows)
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None                         # no .xz pinouts (pip install backports.lzma)
 
 
 # PARAMS
@@ -17,6 +47,8 @@ yOffset = -50                               # basic pin offset (=~ GRID!)
 gridSize = math.fabs(yOffset)
 
 pinGroupSanitize = 5                      # merge groups if first X chars are the same (only if groupname > X)
+autoSanitize = False                        # pick pinGroupSanitize per device: largest one with at most maxUnits groups
+maxUnits = 26                               # Kicad units A ... Z
 yGroupOffset = int(3 * yOffset)
 pinLength = int(4 * gridSize)
 pinTextSize = int(gridSize / 2)
@@ -30,72 +62,262 @@ pwrPinGND = ['GND*', 'VSS*']                # orientation: bottom
 pwrPinVDD = ['VDD*', 'VCC*', 'VR*']         # orientation: top
 clkPin = ['*CLK*', '*CK*']
 ncPin = ['NC']                              # orientation: right
+classifierCacheSize = 4096                  # memoized pin function names, cleared when full
 
 # additional text to display after pinFunction; column IDs (first is 0) as in pdf/txt
 addTxt = [10]
 
+allPackages = False                         # one device per package column (F484, U672, ...) instead of only column 7
+outputFormat = 'lib'                        # 'lib': EESchema-LIBRARY Version 2.3, 'kicad_sym': KiCad 6+ symbol library
+
+# cache of rendered symbols (--cache), keyed by the pinout, the options and this script
+cacheDir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'altera2eeschema')
+cacheSize = 256                             # MB, least recently used entries are evicted above this
+
+watchInterval = 1.0                         # s between two looks at the watched files (--watch)
+
+ioBuffer = 1024 * 1024                      # bytes, read buffer of compressed pinouts and write buffer of libraries
+
+
+class Options(object):
+    # conversion parameters, defaults taken from PARAMS above
+    def __init__(self, **kwargs):
+        self.xMinOffset = xMinOffset
+        self.yOffset = yOffset
+        self.gridSize = gridSize
+        self.pinGroupSanitize = pinGroupSanitize
+        self.autoSanitize = autoSanitize
+        self.yGroupOffset = yGroupOffset
+        self.pinLength = pinLength
+        self.pinTextSize = pinTextSize
+        self.singleGroups = singleGroups
+        self.makeRec = makeRec
+        self.makeUnits = makeUnits
+        self.pwrPinGND = list(pwrPinGND)
+        self.pwrPinVDD = list(pwrPinVDD)
+        self.clkPin = list(clkPin)
+        self.ncPin = list(ncPin)
+        self.classifierCacheSize = classifierCacheSize
+        self.addTxt = list(addTxt)
+        self.allPackages = allPackages
+        self.outputFormat = outputFormat
+        for key, val in kwargs.iteritems():
+            if not hasattr(self, key):
+                raise TypeError('Unknown option ' + key)
+            setattr(self, key, val)
+        # values derived from yOffset / gridSize in PARAMS follow them unless they are given too
+        if 'yOffset' in kwargs:
+            if 'gridSize' not in kwargs:
+                self.gridSize = math.fabs(self.yOffset)
+            if 'yGroupOffset' not in kwargs:
+                self.yGroupOffset = int(3 * self.yOffset)
+        if 'yOffset' in kwargs or 'gridSize' in kwargs:
+            if 'pinLength' not in kwargs:
+                self.pinLength = int(4 * self.gridSize)
+            if 'pinTextSize' not in kwargs:
+                self.pinTextSize = int(self.gridSize / 2)
+        self.classifierKey = None
+
+    def cacheKey(self):
+        # everything that changes the generated symbols
+        return (self.xMinOffset, self.yOffset, self.gridSize, self.pinGroupSanitize, self.autoSanitize, self.yGroupOffset, \
+                self.pinLength, self.pinTextSize, self.singleGroups, self.makeRec, self.makeUnits, \
+                tuple(self.pwrPinGND), tuple(self.pwrPinVDD), tuple(self.clkPin), tuple(self.ncPin), \
+                tuple(self.addTxt), self.allPackages, self.outputFormat)
+
+    def parseKey(self):
+        # the part of cacheKey() which changes the parsed FPs, everything else only changes layout + output
+        return (self.pinGroupSanitize, self.autoSanitize, self.singleGroups, self.makeUnits, tuple(self.pwrPinGND), tuple(self.pwrPinVDD), \
+                tuple(self.clkPin), tuple(self.ncPin), tuple(self.addTxt), self.allPackages)
+
+    def setPinRules(self, rules):
+        self.pwrPinGND = rules.get('gnd', self.pwrPinGND)
+        self.pwrPinVDD = rules.get('vdd', self.pwrPinVDD)
+        self.clkPin = rules.get('clk', self.clkPin)
+        self.ncPin = rules.get('nc', self.ncPin)
+
+    def classifiers(self):
+        # rebuilt only if the pin type patterns changed
+        key = (tuple(self.pwrPinGND), tuple(self.pwrPinVDD), tuple(self.clkPin), tuple(self.ncPin), self.classifierCacheSize)
+        if not key == self.classifierKey:
+            self.pinTypes, self.groupSides = makeClassifiers(self.pwrPinGND, self.pwrPinVDD, self.clkPin, self.ncPin, \
+                                                             self.classifierCacheSize)
+            self.classifierKey = key
+        return self.pinTypes, self.groupSides
+
+
+class PinClassifier(object):
+    # ordered (patterns, result) rules compiled into one regex, first matching rule wins
+    def __init__(self, rules, default, cacheSize=classifierCacheSize):
+        parts = []
+        self.results = []
+        for idx, (patterns, result) in enumerate(rules):
+            self.results.append(result)
+            if len(patterns) > 0:
+                parts.append('(?P<r{}>{})'.format(idx, '|'.join(globRegex(s) for s in patterns)))
+        if len(parts) > 0:
+            self.regex = re.compile('(?s)' + '|'.join(parts))
+        else:
+            self.regex = None
+        self.default = default
+        self.cache = {}
+        self.cacheSize = cacheSize
+        self.misses = 0                         # regex matches actually run, see --profile
+
+    def classify(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        self.misses += 1
+        m = None
+        if self.regex is not None:
+            m = self.regex.match(name)
+        if m is None:
+            result = self.default
+        else:
+            result = self.results[int(m.lastgroup[1:])]
+        if len(self.cache) >= self.cacheSize:
+            self.cache.clear()
+        self.cache[name] = result
+        return result
+
+
+class CodeTable(object):
+    # string <-> small int, unknown strings get the next free code
+    def __init__(self, names):
+        self.names = list(names)
+        self.codes = dict((name, idx) for idx, name in enumerate(self.names))
+
+    def code(self, name):
+        idx = self.codes.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.names.append(name)
+            self.codes[name] = idx
+        return idx
+
+pinOrientations = CodeTable(['', 'U', 'D', 'L', 'R'])
+pinSymbols = CodeTable(['B', 'W', 'C C', 'N'])
+
+class Pin(object):
+    # compact record: no __dict__, repeated strings interned, orientation and type as small codes
+    __slots__ = ('pinID', 'pinFunction', 'pinGroup', 'symbolCode', 'orientationCode', 'group', 'addTxt')
 
-class Pin:
     def __init__(self, pinID, pinFunction, pinGroup, symbol, orientation, aTxt):
         self.pinID = pinID
-        self.pinFunction = pinFunction
-        self.pinGroup = pinGroup
-        self.symbol = symbol
-        self.orientation = orientation
-        self.actualGroup = pinGroup
-        self.addTxt = aTxt
-        
-class FP:
-    def __init__(self, name, sanitize):
+        self.pinFunction = intern(pinFunction)
+        self.pinGroup = intern(pinGroup)
+        self.symbolCode = pinSymbols.code(symbol)
+        self.orientationCode = pinOrientations.code(orientation)
+        self.group = None                       # PinGroup, set by FP.addPin
+        self.addTxt = intern(aTxt)
+
+    @property
+    def symbol(self):
+        return pinSymbols.names[self.symbolCode]
+
+    @property
+    def orientation(self):
+        return pinOrientations.names[self.orientationCode]
+
+    @orientation.setter
+    def orientation(self, orientation):
+        self.orientationCode = pinOrientations.code(orientation)
+
+    @property
+    def actualGroup(self):
+        # resolved through the group, so renaming a group never touches its pins
+        return self.group.name
+
+    def __getstate__(self):
+        # codes are only valid in this process, pickle the strings
+        return (self.pinID, self.pinFunction, self.pinGroup, self.symbol, self.orientation, self.group, self.addTxt)
+
+    def __setstate__(self, state):
+        pinID, pinFunction, pinGroup, symbol, orientation, group, aTxt = state
+        Pin.__init__(self, pinID, pinFunction, pinGroup, symbol, orientation, aTxt)
+        self.group = group
+
+
+class PinGroup(object):
+    def __init__(self, name, idx):
         self.name = name
+        self.idx = idx                          # position in FP.pinGroups
         self.pins = []
+
+class FP(object):
+    def __init__(self, name, sanitize):
+        self.name = name
+        self.device = ''                        # set by the parser at the end of the block
         self.pinGroups = []
+        self.groups = {}                        # group name -> PinGroup
+        self.prefixes = {}                      # first 'sanitize' chars -> PinGroup longer than that
+        self.flatPins = None
         self.groupTypes = []
         self.san = sanitize
         self.gSizes = {}
         self.gMaxTxtExtents = {}
+        self.gOrientations = {}
+        self.statsValid = False
         self.gUnitMapping = {}
         self.phySize = []
+        self.mergedNames = set()                # group names folded into a 'prefix*' group by pinGroupSanitize
+        self.pinOrder = []                      # pins as added, see regroup()
         
-    def updateMapping(self, increment):
+    @property
+    def pins(self):
+        # flat view over the group buckets, only rebuilt after new pins were added
+        if self.flatPins is None:
+            self.flatPins = [pin for grp in self.pinGroups for pin in self.groups[grp].pins]
+        return self.flatPins
+
+    def updateMapping(self, increment, report=False):
         idx = 1
-        p = False
-        if len(self.pinGroups) > 26 and increment:
-            print 'Warning: Kicad units active but too many pin groups found ({} vs. 26 allowed). \n'.format(str(len(self.pinGroups))), \
-                    'Maybe decrease \'pinGroupSanitize\' parameter?\npin groups:\n\tpGroup\tLength\tKicad Unit'
+        p = report
+        if len(self.pinGroups) > maxUnits and increment:
+            print 'Warning: Kicad units active but too many pin groups found ({} vs. {} allowed). \n'.format(str(len(self.pinGroups)), maxUnits), \
+                    'Maybe decrease \'pinGroupSanitize\' parameter?'
             p = True
+        if p:
+            print 'pin groups:\n\tpGroup\tLength\tKicad Unit'
         for grp in self.pinGroups:
             self.gUnitMapping.update({grp : idx})
             if p:
                 print '\t', grp, '\t', self.getGroupSize(grp), '\t', chr(idx + 64)
-            if increment and idx < 26:
+            if increment and idx < maxUnits:
                 idx += 1
             
+    def updateStats(self):
+        # size and text extents of all groups in one pass, kept until new pins are added
+        if self.statsValid:
+            return
+        self.gSizes = {}
+        self.gMaxTxtExtents = {}
+        for grp in self.pinGroups:
+            pins = self.groups[grp].pins
+            maxTxtLen = 0
+            for pin in pins:
+                if maxTxtLen <= len(pin.pinFunction) + len(pin.addTxt):
+                    maxTxtLen = len(pin.pinFunction) + len(pin.addTxt)
+            self.gSizes[grp] = len(pins)
+            self.gMaxTxtExtents[grp] = maxTxtLen
+        self.statsValid = True
+
     def getGroupSize(self, group):
-        size = 0
-        for pin in self.pins:
-            if pin.actualGroup == group:
-                size += 1
-        self.gSizes.update({group : size})
-        return size
+        self.updateStats()
+        return self.gSizes[group]
         
     def getGroupNumber(self):
         return len(self.pinGroups)
         
     def setGroupOrientation(self, group, orientation):
-        maxTxtLen = 0
-        for pin in self.pins:
-            if pin.actualGroup == group:
-                self.pins[self.pins.index(pin)].orientation = orientation
-                if maxTxtLen <= len(pin.pinFunction) + len(pin.addTxt):
-                    maxTxtLen = len(pin.pinFunction) + len(pin.addTxt)
-                    
-        self.gMaxTxtExtents.update({group : maxTxtLen})
+        self.gOrientations[group] = orientation
+        for pin in self.groups[group].pins:
+            pin.orientation = orientation
 
-    def calcPhysLayout(self, tPins, bPins, rPins, lPins, xPins, groupOffset, pinOffset, txtSize, pLength):
+    def calcPhysLayout(self, sides, groupOffset, pinOffset, txtSize, pLength):
         # rule: top & bottom are fixed + reserved for GND and VDD
-        self.gSize = {}
-        self.gMaxTxtExtents = {}
+        self.updateStats()
+        self.gOrientations = {}
         gOffset = math.fabs(groupOffset)
         pOffset = math.fabs(pinOffset)
         bSize = -1 * (gOffset - pOffset)
@@ -106,16 +328,17 @@ class FP:
         for grp in self.pinGroups:
             gSize = self.getGroupSize(grp)
             #print 'group:', grp, gSize
-            if any(fnmatch.fnmatch(grp, s) for s in bPins):
+            side = sides.classify(grp)
+            if side == 'U':
                 bSize += gSize * pOffset + gOffset
                 self.setGroupOrientation(grp, 'U')
-            elif any(fnmatch.fnmatch(grp, s) for s in tPins):
+            elif side == 'D':
                 tSize += gSize * pOffset + gOffset
                 self.setGroupOrientation(grp, 'D')
-            elif any(fnmatch.fnmatch(grp, s) for s in lPins):
+            elif side == 'R':
                 lSize += gSize * pOffset + gOffset
                 self.setGroupOrientation(grp, 'R')
-            elif any(fnmatch.fnmatch(grp, s) for s in rPins):
+            elif side == 'L':
                 rSize += gSize * pOffset + gOffset
                 self.setGroupOrientation(grp, 'L')
             else:
@@ -133,19 +356,15 @@ class FP:
                 self.setGroupOrientation(sHash[idx], 'L')
             idx += 1
         
-        tTxtLen = 0
-        bTxtLen = 0
-        rTxtLen = 0
-        lTxtLen = 0
-        for pin in self.pins:
-            if pin.orientation == 'U' and len(pin.pinFunction) + len(pin.addTxt) >= bTxtLen:
-                bTxtLen = len(pin.pinFunction) + len(pin.addTxt)
-            if pin.orientation == 'D' and len(pin.pinFunction) + len(pin.addTxt) >= tTxtLen:
-                tTxtLen = len(pin.pinFunction) + len(pin.addTxt)
-            if pin.orientation == 'L' and len(pin.pinFunction) + len(pin.addTxt) >= rTxtLen:
-                rTxtLen = len(pin.pinFunction) + len(pin.addTxt)
-            if pin.orientation == 'R' and len(pin.pinFunction) + len(pin.addTxt) >= lTxtLen:
-                lTxtLen = len(pin.pinFunction) + len(pin.addTxt)
+        txtLen = {'U': 0, 'D': 0, 'L': 0, 'R': 0}
+        for grp in self.pinGroups:
+            orientation = self.gOrientations[grp]
+            if self.gMaxTxtExtents[grp] >= txtLen[orientation]:
+                txtLen[orientation] = self.gMaxTxtExtents[grp]
+        tTxtLen = txtLen['D']
+        bTxtLen = txtLen['U']
+        rTxtLen = txtLen['L']
+        lTxtLen = txtLen['R']
         if tSize >= bSize:
             tSize += (rTxtLen + lTxtLen) * txtSize + 2 * math.fabs(pLength)
             tOffset = lTxtLen * txtSize + math.fabs(pLength)
@@ -169,261 +388,1016 @@ class FP:
         return [tSize, bSize, lSize, rSize, tOffset, bOffset, lOffset, rOffset]
         
         
+    def regroup(self, sanitize, pins=None):
+        # same FP as parsed with another pinGroupSanitize, the pins are added again in the order of the pinout
+        fp = FP(self.name, sanitize)
+        fp.device = self.device
+        for pin in (self.pinOrder if pins is None else pins):
+            fp.addPin(pin.pinID, pin.pinFunction, pin.pinGroup, pin.symbol, pin.orientation, pin.addTxt)
+        return fp
+
+    def sanitizeCandidates(self):
+        # number of groups for every pinGroupSanitize that makes a difference -> [(pinGroupSanitize, groups)]
+        # the group of a pin only depends on its pin group and function, one pin of each pair gives the same groups
+        firstPins = OrderedDict()
+        for pin in self.pinOrder:
+            firstPins.setdefault((pin.pinGroup, pin.pinFunction), pin)
+        longest = max([len(pinGroup or pinFunction) for pinGroup, pinFunction in firstPins])
+        return [(san, len(self.regroup(san, firstPins.itervalues()).pinGroups)) for san in range(longest + 1)]
+
+    def newGroup(self, name):
+        grp = PinGroup(name, len(self.pinGroups))
+        self.pinGroups.append(name)
+        self.groups[name] = grp
+        if len(name) > self.san:
+            self.prefixes[name[:self.san]] = grp
+        return grp
+
+    def renameGroup(self, grp, name):
+        del self.groups[grp.name]
+        grp.name = name
+        self.groups[name] = grp
+        self.pinGroups[grp.idx] = name
+        
     def addPin(self, pinID, pinFunction, pinGroup, symbol, orientation, aTxt):
         newpin = Pin(pinID, pinFunction, pinGroup, symbol, orientation, aTxt)
         # check for 'actual' groups which only differ by their last char
-        if not newpin.pinGroup == '' and len(newpin.pinGroup) <=  self.san:
-            if newpin.pinGroup not in self.pinGroups:
-                self.pinGroups.append(newpin.pinGroup)
+        if not pinGroup == '' and len(pinGroup) <=  self.san:
+            grp = self.groups.get(pinGroup)
+            if grp is None:
+                grp = self.newGroup(pinGroup)
         else:
-            if not newpin.pinGroup == '':
-                refString = newpin.pinGroup
-                #print 'gsan'
+            if not pinGroup == '':
+                refString = pinGroup
             else:
-                refString = newpin.pinFunction
-                #print 'fsan'
-            if refString not in self.pinGroups:
+                refString = pinFunction
+            grp = self.groups.get(refString)
+            if grp is None:
                 matchGroups = refString[:self.san] + '*'
-                if matchGroups in self.pinGroups:
-                    #print matchGroups, 'found!'
-                    grpIdx = self.pinGroups.index(matchGroups)
-                    newpin.actualGroup = self.pinGroups[grpIdx]
-                else:
-                    #print 'curr groups:', self.pinGroups
-                    #print 'curr matchGroups:', matchGroups
-                    merge = False
-                    for grp in self.pinGroups:
-                        if grp.startswith(matchGroups[:-1]) and len(grp) > self.san and len(matchGroups) == self.san + 1:
-                            # mergeable group found!
-                            #print matchGroups, ': merge happening!'
-                            merge = True
-                            self.pinGroups[self.pinGroups.index(grp)] = matchGroups
-                            for pin in self.pins:
-                                if pin.actualGroup.startswith(matchGroups[:-1]) and len(pin.actualGroup) > self.san \
-                                        and not pin.actualGroup == matchGroups:
-                                    self.pins[self.pins.index(pin)].actualGroup = matchGroups
-                    if merge:               
-                        newpin.actualGroup = matchGroups
+                grp = self.groups.get(matchGroups)
+                if grp is None:
+                    if len(matchGroups) == self.san + 1:
+                        grp = self.prefixes.get(matchGroups[:-1])
+                    if grp is not None:
+                        # mergeable group found! (there is at most one per prefix)
+                        self.mergedNames.add(grp.name)
+                        self.mergedNames.add(refString)
+                        self.renameGroup(grp, matchGroups)
                     else:
-                        newpin.actualGroup = refString
-                        self.pinGroups.append(refString)
-            else:
-                newpin.actualGroup = refString
+                        grp = self.newGroup(refString)
+                else:
+                    self.mergedNames.add(refString)
              
-        pinIdx = len(self.pins)
-        for k, pin in enumerate(self.pins):
-            if pin.actualGroup == newpin.actualGroup:
-                pinIdx = k
-        self.pins.insert(pinIdx, newpin)
-        #print '\n\npin:', newpin.pinID, 'curr grps:', self.pinGroups
+        # a new pin goes in front of the last pin of its group
+        newpin.group = grp
+        self.pinOrder.append(newpin)
+        if grp.pins:
+            grp.pins.insert(len(grp.pins) - 1, newpin)
+        else:
+            grp.pins.append(newpin)
+        self.flatPins = None
+        self.statsValid = False
                 
 
-# functions
-def find_all(a_str, sub):
-    start = 0
-    while True:
-        start = a_str.find(sub, start)
-        if start == -1: 
+class LibIndex(object):
+    # byte ranges of the DEF entries in a legacy .lib, the '#' comment block above DEF included
+    def __init__(self, txt):
+        self.txt = txt
+        self.blocks = []                        # (name, start, end) of all DEF blocks in file order
+        self.tail = len(txt)                    # start of '#\n#End Library'
+        pos = 0
+        entryStart = None
+        name = None
+        while pos < len(txt):
+            end = txt.find('\n', pos)
+            if end == -1:
+                end = len(txt)
+            else:
+                end += 1
+            line = txt[pos:end]
+            if name is not None:
+                if line.startswith('ENDDEF'):
+                    self.blocks.append((name, entryStart, end))
+                    name = None
+                    entryStart = None
+            elif line.startswith('DEF '):
+                name = line.split()[1].lstrip('~')
+                if entryStart is None:
+                    entryStart = pos
+            elif line.startswith('#End Library'):
+                if entryStart is None:
+                    entryStart = pos
+                self.tail = entryStart
+                break
+            elif line.startswith('#') and not line.startswith('#encoding'):
+                if entryStart is None:
+                    entryStart = pos
+            else:
+                entryStart = None
+            pos = end
+
+class SymIndex(object):
+    # same as LibIndex for a .kicad_sym, top level symbols start with '  (symbol "' and end with '  )'
+    def __init__(self, txt):
+        self.txt = txt
+        self.blocks = []
+        self.tail = txt.rfind('\n)') + 1      # closing bracket of kicad_symbol_lib
+        if self.tail == 0:
+            self.tail = len(txt)
+        for m in re.finditer(r'^  \(symbol "((?:[^"\\]|\\.)*)".*?^  \)[^\n]*\n', txt, re.M | re.S):
+            name = m.group(1).replace('\\"', '"').replace('\\\\', '\\')
+            self.blocks.append((name, m.start(), m.end()))
+
+class LegacyWriter(object):
+    # symbol items -> EESchema-LIBRARY Version 2.3 lines, coordinates in mil
+    ext = '.lib'
+    index = LibIndex
+    header = 'EESchema-LIBRARY Version 2.3\n' \
+             '#encoding utf-8\n'
+    footer = '#\n' \
+             '#End Library'
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, name, footprint, units, x, y, align, fpFilter):
+        self.out.write('#\n' \
+                       '# {}\n' \
+                       '#\n' \
+                       'DEF {} U 0 40 Y Y {} L N\n' \
+                       'F0 \"U\" {} {} 60 H V {} CNN\n' \
+                       'F1 \"{}\" {} {} 60 H V {} CNN\n' \
+                       'F2 \"{}\" {} {} 60 H V {} CIN\n' \
+                       'F3 \"~\" {} {} 60 H V {} CNN\n' \
+                       '$FPLIST\n' \
+                       ' {}\n' \
+                       '$ENDFPLIST\n' \
+                       'DRAW\n' \
+                            .format(name, name, units, x, y, align, name, x, y - 100, align, \
+                                    footprint, x, y - 200, align, x, y - 300, align, fpFilter))
+
+    def rect(self, x1, y1, x2, y2, unit, width):
+        self.out.write('S {} {} {} {} {} 1 {} N\n'.format(x1, y1, x2, y2, unit, width))
+
+    def text(self, angle, x, y, size, unit, txt, hAlign, vAlign):
+        self.out.write('T {} {} {} {} 0 {} 0 {} Normal 0 {} {}\n'.format(angle, x, y, size, unit, txt, hAlign, vAlign))
+
+    def pins(self, names, numbers, xs, ys, length, orientation, size, unit, symbols):
+        # all pins of a group in one write, only name, number, position and type differ from pin to pin
+        line = 'X %s %s %s %s {} {} {} {} {} 1 %s\n'.format(length, orientation, size, size, unit)
+        self.out.write(''.join([line % pin for pin in itertools.izip(names, numbers, xs, ys, symbols)]))
+
+    def end(self):
+        self.out.write('ENDDRAW\n' \
+                       'ENDDEF\n')
+
+    @staticmethod
+    def addAliases(name, txt, aliases):
+        # ALIAS line between the fields and $FPLIST
+        pos = txt.index('\n$FPLIST\n') + 1
+        return [(name, txt[:pos] + 'ALIAS ' + ' '.join(aliases) + '\n' + txt[pos:])]
+
+    @staticmethod
+    def aliasNames(txt):
+        pos = txt.find('\nALIAS ')
+        if pos == -1:
+            return []
+        return txt[pos + 7:txt.index('\n', pos + 1)].split()
+
+    @staticmethod
+    def parentName(txt):
+        return None
+
+    @staticmethod
+    def symbolInfo(txt):
+        # -> package (footprint field), number of pins
+        m = re.search(r'^F2 "([^"]*)"', txt, re.M)
+        return m.group(1) if m else '', txt.count('\nX ')
+
+    @staticmethod
+    def readPins(txt):
+        # library -> {symbol name: {pin number: [(name, type, unit)]}}, an alias shares the pins of its DEF
+        # (one findall per DEF block, pin names may contain spaces)
+        symbols = {}
+        pinLine = re.compile(r'^X (.*) (\S+) -?\d+ -?\d+ -?\d+ [UDLR] \d+ \d+ (\d+) \d+ (\S+(?: \S+)?)$', re.M)
+        for block in txt.split('\nDEF ')[1:]:
+            pins = {}
+            for name, number, unit, pinType in pinLine.findall(block):
+                pins.setdefault(number, []).append((name, pinType, int(unit)))
+            symbols[block[:block.index(' ')].lstrip('~')] = pins
+            for alias in LegacyWriter.aliasNames(block):
+                symbols[alias] = pins
+        return symbols
+
+class KicadSymWriter(object):
+    # symbol items -> KiCad 6+ S-expressions in mm, the units of one symbol are collected until end()
+    ext = '.kicad_sym'
+    index = SymIndex
+    header = '(kicad_symbol_lib (version 20211014) (generator altera2eeschema)\n'
+    footer = ')\n'
+    angles = {'R': 0, 'U': 90, 'L': 180, 'D': 270}
+    pinTypes = {'B': 'bidirectional line', 'W': 'power_in line', 'N': 'no_connect line', 'C C': 'open_collector clock'}
+    hJustify = {'L': ' left', 'R': ' right', 'C': ''}
+    vJustify = {'T': ' top', 'B': ' bottom', 'C': ''}
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, name, footprint, units, x, y, align, fpFilter):
+        self.name = name
+        self.units = {}                         # unit -> items, 0 is drawn in all units
+        justify = self.hJustify[align]
+        if not justify == '':
+            justify = ' (justify{})'.format(justify)
+        font = '(font (size 1.524 1.524){})'
+        self.out.write('  (symbol "{}" (pin_names (offset 1.016)) (in_bom yes) (on_board yes)\n' \
+                       '    (property "Reference" "U" (id 0) (at {} {} 0)\n' \
+                       '      (effects {}{})\n' \
+                       '    )\n' \
+                       '    (property "Value" "{}" (id 1) (at {} {} 0)\n' \
+                       '      (effects {}{})\n' \
+                       '    )\n' \
+                       '    (property "Footprint" "{}" (id 2) (at {} {} 0)\n' \
+                       '      (effects {}{})\n' \
+                       '    )\n' \
+                       '    (property "Datasheet" "" (id 3) (at {} {} 0)\n' \
+                       '      (effects {}{} hide)\n' \
+                       '    )\n' \
+                       '    (property "ki_fp_filters" "{}" (id 4) (at 0 0 0)\n' \
+                       '      (effects (font (size 1.27 1.27)) hide)\n' \
+                       '    )\n' \
+                            .format(quoted(name), mm(x), mm(y), font.format(''), justify, \
+                                    quoted(name), mm(x), mm(y - 100), font.format(''), justify, \
+                                    quoted(footprint), mm(x), mm(y - 200), font.format(' italic'), justify, \
+                                    mm(x), mm(y - 300), font.format(''), justify, quoted(fpFilter)))
+        if units > 1:
+            self.out.write('    (property "ki_locked" "" (id 5) (at 0 0 0)\n' \
+                           '      (effects (font (size 1.27 1.27)))\n' \
+                           '    )\n')
+
+    def add(self, unit, item):
+        items = self.units.get(unit)
+        if items is None:
+            items = []
+            self.units[unit] = items
+        items.append(item)
+
+    def rect(self, x1, y1, x2, y2, unit, width):
+        self.add(unit, '      (rectangle (start {} {}) (end {} {})\n' \
+                       '        (stroke (width {}) (type default) (color 0 0 0 0))\n' \
+                       '        (fill (type none))\n' \
+                       '      )\n'.format(mm(x1), mm(y1), mm(x2), mm(y2), mm(width)))
+
+    def text(self, angle, x, y, size, unit, txt, hAlign, vAlign):
+        # symbol text angles stay in 0.1 degree in this format, unlike pins
+        justify = self.hJustify[hAlign] + self.vJustify[vAlign]
+        if not justify == '':
+            justify = ' (justify{})'.format(justify)
+        self.add(unit, '      (text "{}" (at {} {} {})\n' \
+                       '        (effects (font (size {} {})){})\n' \
+                       '      )\n'.format(quoted(txt), mm(x), mm(y), angle, mm(size), mm(size), justify))
+
+    def pins(self, names, numbers, xs, ys, length, orientation, size, unit, symbols):
+        # one item for all pins of a group, the coordinates of a column or row repeat and are converted once
+        item = '      (pin %s (at %s %s {}) (length {})\n' \
+               '        (name "%s" (effects (font (size {} {}))))\n' \
+               '        (number "%s" (effects (font (size {} {}))))\n' \
+               '      )\n'.format(self.angles.get(orientation, 0), mm(length), mm(size), mm(size), mm(size), mm(size))
+        coords = dict((v, mm(v)) for v in set(xs).union(ys))
+        pinTypes = self.pinTypes
+        self.add(unit, ''.join([item % (pinTypes.get(symbol, 'unspecified line'), coords[x], coords[y], quoted(name), quoted(number)) \
+                                for name, number, x, y, symbol in itertools.izip(names, numbers, xs, ys, symbols)]))
+
+    def end(self):
+        for unit in sorted(self.units):
+            self.out.write('    (symbol "{}_{}_1"\n'.format(quoted(self.name), unit))
+            for item in self.units[unit]:
+                self.out.write(item)
+            self.out.write('    )\n')
+        self.out.write('  )\n')
+        self.units = {}
+
+    @staticmethod
+    def addAliases(name, txt, aliases):
+        # no ALIAS in this format, every alias is a symbol of its own which extends 'name' by its properties
+        props = txt[txt.index('\n') + 1:txt.index('    (symbol \"')]
+        symbols = [(name, txt)]
+        for alias in aliases:
+            symbols.append((alias, '  (symbol \"{}\" (extends \"{}\")\n'.format(quoted(alias), quoted(name)) + \
+                            props.replace('(property \"Value\" \"{}\"'.format(quoted(name)), \
+                                          '(property \"Value\" \"{}\"'.format(quoted(alias))) + \
+                            '  )\n'))
+        return symbols
+
+    @staticmethod
+    def aliasNames(txt):
+        return []                               # aliases are symbols of their own here
+
+    @staticmethod
+    def parentName(txt):
+        m = re.match(r'  \(symbol "(?:[^"\\]|\\.)*" \(extends "((?:[^"\\]|\\.)*)"\)', txt)
+        return m.group(1) if m else None
+
+    @staticmethod
+    def symbolInfo(txt):
+        m = re.search(r'\(property "Footprint" "((?:[^"\\]|\\.)*)"', txt)
+        return m.group(1) if m else '', txt.count('\n      (pin ')
+
+    @staticmethod
+    def readPins(txt):
+        # same as LegacyWriter.readPins(), types back to the pin symbols of the script, the unit is in the unit name
+        types = dict((v, k) for k, v in KicadSymWriter.pinTypes.iteritems())
+        symbols = {}
+        parents = {}
+        pinItem = re.compile(r'^      \(pin (\S+ \S+) \(at [^\n]*\n' \
+                             r'        \(name "((?:[^"\\]|\\.)*)"[^\n]*\n' \
+                             r'        \(number "((?:[^"\\]|\\.)*)"', re.M)
+        for block in txt.split('\n  (symbol "')[1:]:
+            units = block.split('\n    (symbol "')
+            m = re.match(r'((?:[^"\\]|\\.)*)"(?: \(extends "((?:[^"\\]|\\.)*)"\))?', units[0])
+            pins = {}
+            symbols[unquoted(m.group(1))] = pins
+            if m.group(2) is not None:
+                parents[unquoted(m.group(1))] = unquoted(m.group(2))
+            for unitTxt in units[1:]:
+                unit = int(re.match(r'(?:[^"\\]|\\.)*_(\d+)_1"', unitTxt).group(1))
+                for pinType, name, number in pinItem.findall(unitTxt):
+                    pins.setdefault(unquoted(number), []).append((unquoted(name), types.get(pinType, pinType), unit))
+        for name, parent in parents.iteritems():
+            if parent in symbols:
+                symbols[name] = symbols[parent]
+        return symbols
+
+libFormats = {'lib': LegacyWriter, 'kicad_sym': KicadSymWriter}
+
+class AtomicFile(object):
+    # writes go to a temp file next to 'path' which replaces it on commit()
+    def __init__(self, path):
+        self.path = path
+        fd, self.tmpPath = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', \
+                                            dir=os.path.dirname(os.path.abspath(path)))
+        self.f = os.fdopen(fd, 'wb', ioBuffer)
+
+    def write(self, txt):
+        self.f.write(txt)
+
+    def commit(self):
+        self.f.close()
+        if os.path.isfile(self.path):
+            shutil.copymode(self.path, self.tmpPath)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self.tmpPath, 0666 & ~umask)
+        if os.name == 'nt' and os.path.isfile(self.path):
+            os.remove(self.path)                # no atomic rename over existing files on windows
+        os.rename(self.tmpPath, self.path)
+
+    def discard(self):
+        self.f.close()
+        os.remove(self.tmpPath)
+
+class StreamFile(object):
+    # AtomicFile for stdout ('-'), there is nothing to replace, the output is only flushed
+    def __init__(self, stream):
+        self.f = stream
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.setmode(stream.fileno(), os.O_BINARY)
+
+    def write(self, txt):
+        self.f.write(txt)
+
+    def commit(self):
+        self.f.flush()
+
+    def discard(self):
+        self.f.flush()
+
+def openLibrary(path):
+    if path == '-':
+        return StreamFile(sys.__stdout__)       # sys.stdout itself goes to stderr then, see main()
+    return AtomicFile(path)
+
+class SymbolCache(object):
+    # one pickle of [(symbol name, symbol text)] per pinout + options, evicted by size
+    def __init__(self, path=cacheDir, maxSize=cacheSize):
+        self.path = path
+        self.maxSize = maxSize * 1024 * 1024
+
+    def key(self, data, opts):
+        h = hashlib.sha1()
+        h.update(scriptHash())
+        h.update(repr(opts.cacheKey()))
+        h.update(data)
+        return h.hexdigest()
+
+    def entryPath(self, key):
+        return os.path.join(self.path, key + '.cache')
+
+    def get(self, key):
+        path = self.entryPath(key)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            symbols = cPickle.load(f)
+        except Exception:
+            return None                         # broken entry, will be overwritten
+        finally:
+            f.close()
+        try:
+            os.utime(path, None)                # mark as recently used
+        except OSError:
+            pass
+        return symbols
+
+    def put(self, key, symbols):
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                if not os.path.isdir(self.path):
+                    raise
+        out = AtomicFile(self.entryPath(key))
+        out.write(cPickle.dumps(symbols, cPickle.HIGHEST_PROTOCOL))
+        out.commit()
+        self.evict()
+
+    def entries(self):
+        # (last use, size, path), oldest first
+        entries = []
+        for path in glob.glob(os.path.join(self.path, '*.cache')):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue                        # removed by another process
+            entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        entries = self.entries()
+        for mtime, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(entries)
+
+class Layout(object):
+    # start positions of the four sides of a single block device, see layoutSymbol()
+    pass
+
+class WatchedFile(object):
+    # pinout file with its parsed devices and rendered symbols, kept in memory by --watch
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None                       # (mtime, size) of the last look
+        self.data = None
+        self.parseKey = None
+        self.FPs = []
+        self.renderKey = None
+        self.symbols = []
+
+    def changed(self):
+        # stat first, the content decides
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        stamp = (st.st_mtime, st.st_size)
+        if stamp == self.stamp:
+            return False
+        self.stamp = stamp
+        data = readPinout(self.path)
+        if data == self.data:
+            return False
+        self.data = data
+        self.parseKey = None
+        return True
+
+    def update(self, opts):
+        # reparse / render only what the data and the options require, -> True if the symbols were rebuilt
+        parseKey = opts.parseKey()
+        renderKey = opts.cacheKey()
+        if parseKey == self.parseKey and renderKey == self.renderKey:
+            return False
+        reparse = not parseKey == self.parseKey
+        self.parseKey = parseKey
+        self.renderKey = renderKey
+        if not reparse and len(self.FPs) == 0:
+            return False                        # failed before, nothing to render
+        try:
+            if reparse:
+                self.FPs = parsePinout(cStringIO.StringIO(self.data), opts)[1]
+                if len(self.FPs) == 0:
+                    raise ValueError('no pin table found')
+            self.symbols = renderSymbols(self.FPs, opts)
+        except Exception:
+            # no retry before the file or the options change again
+            self.FPs = []
+            self.symbols = []
+            raise
+        return True
+
+class Profile(object):
+    # per device wall time + memory growth of the conversion phases and some counters (--profile)
+    # memory of 'read' includes 'group', the pins are grouped while the lines are read
+    phases = ['read', 'group', 'layout', 'emit']
+
+    def __init__(self):
+        self.records = []
+        self.byFP = {}
+        self.path = ''                          # pinout file of the following records
+
+    def record(self, fp):
+        rec = self.byFP.get(fp)
+        if rec is None:
+            rec = OrderedDict([('file', self.path), ('device', ''), ('package', fp.name), ('pins', 0), ('groups', 0), \
+                               ('merged', 0), ('classifierMisses', 0), ('bytes', 0), \
+                               ('phases', OrderedDict((phase, OrderedDict([('time', 0.0), ('memory', None)])) for phase in self.phases))])
+            self.byFP[fp] = rec
+            self.records.append(rec)
+        return rec
+
+    def start(self, opts):
+        pinTypes, groupSides = opts.classifiers()
+        return timer(), pinTypes.misses + groupSides.misses, currentMemory()
+
+    def stop(self, fp, phase, token, opts, size=0):
+        pinTypes, groupSides = opts.classifiers()
+        rec = self.record(fp)
+        rec['phases'][phase]['time'] += timer() - token[0]
+        memory = currentMemory()
+        if memory is not None:
+            rec['phases'][phase]['memory'] = (rec['phases'][phase]['memory'] or 0) + memory - token[2]
+        rec['classifierMisses'] += pinTypes.misses + groupSides.misses - token[1]
+        rec['bytes'] += size
+
+    def addGroupTime(self, fp, seconds):
+        self.record(fp)['phases']['group']['time'] += seconds
+
+    def moveRecord(self, fp, newFP):
+        # FP replaced by a regrouped one (autoSanitize)
+        if fp in self.byFP:
+            self.byFP[newFP] = self.byFP.pop(fp)
+
+    def endBlock(self, device, FPs, token, opts):
+        # the lines of a block are read + classified once for all its packages, booked on the first one
+        FPs = [fp for fp in FPs if fp in self.byFP]
+        if len(FPs) == 0:
             return
-        yield start
-        start += len(sub)
-        
+        grouping = sum(self.byFP[fp]['phases']['group']['time'] for fp in FPs)
+        self.stop(FPs[0], 'read', (token[0] + grouping, token[1], token[2]), opts)
+        for fp in FPs:
+            rec = self.byFP[fp]
+            rec['device'] = device
+            rec['pins'] = len(fp.pins)
+            rec['groups'] = len(fp.pinGroups)
+            rec['merged'] = len(fp.mergedNames)
 
-# cmd-line input
-argc = len(sys.argv)
-cmdaddTxt = []
-cmdSanit = -1
-sourcePath = ''
-destPath = ''
-if argc == 1:
-    print 'At least specify input .txt file! Call with -h for help!'
-    quit()
-if argc > 1:
-    cidx = 1
-    while cidx < argc:
-        if sys.argv[cidx] == '-h':
-            print 'Command line options (optional in [brackets]):\n', \
-                ' python alteraFP2escheema.py [<options>] <input file path> [<output file path>]\n', \
-                '\t If <output file path> matches existing lib, part(s) will be added to this lib.\n', \
-                '\tAv. options:\n', \
-                '\t -a:\t specify column IDs in .txt/.pdf you want to \n', \
-                '\t\tinclude as pin function text (1st col ID is 0)\n\t\te.g. -a 8,10,11\n', \
-                '\t\tWarning: too many chars and Kicad cannot load library!\n', \
-                '\t -s:\t pinGroupSanitize: if first n chars of pinFunction\n', \
-                '\t\tare the same, group together\n\t\te.g. -s 4\n'
-            quit()
-        if sys.argv[cidx] == '-a':
-            if cidx == argc - 1:
-                print 'Not enough arguments! Call with -h for help!'
-                quit()
-            cmdaddTxt = [int(n) for n in sys.argv[cidx + 1].split(',')]
-            cidx += 1
-        elif sys.argv[cidx] == '-s':
-            if cidx == argc - 1:
-                print 'Not enough arguments! Call with -h for help!'
-                quit()
-            cmdSanit = int(sys.argv[cidx + 1])
-            if cmdSanit < 0:
-                print 'Wrong argument! Call with -h for help!'
-                quit()
-            cidx += 1
-        elif sourcePath == '':
-            sourcePath = sys.argv[cidx]
+    def totals(self):
+        total = OrderedDict([('device', 'total'), ('package', '')])
+        for key in ['pins', 'groups', 'merged', 'classifierMisses', 'bytes']:
+            total[key] = sum(rec[key] for rec in self.records)
+        total['phases'] = OrderedDict((phase, OrderedDict([('time', sum(rec['phases'][phase]['time'] for rec in self.records)), \
+                                                           ('memory', self.memory(self.records, phase))])) for phase in self.phases)
+        total['peak'] = peakMemory()
+        return total
+
+    def memory(self, records, phase=None):
+        # growth in bytes of 'phase' (all phases if None), None if it was never measured
+        values = [rec['phases'][p]['memory'] for rec in records for p in self.phases if phase in [None, p]]
+        values = [v for v in values if v is not None]
+        return sum(values) if len(values) > 0 else None
+
+    def table(self):
+        rows = [['device', 'package', 'pins', 'groups', 'merged', 'regex', 'bytes', \
+                 'read ms', 'group ms', 'layout ms', 'emit ms', '+MB']]
+        total = self.totals()
+        for rec in self.records + [total]:
+            memory = self.memory([rec])
+            rows.append([rec['device'], rec['package'], str(rec['pins']), str(rec['groups']), str(rec['merged']), \
+                         str(rec['classifierMisses']), str(rec['bytes'])] + \
+                        ['{:.1f}'.format(rec['phases'][phase]['time'] * 1000) for phase in self.phases] + \
+                        ['-' if memory is None else '{:.1f}'.format(memory / 1048576.0)])
+        widths = [max(len(row[col]) for row in rows) for col in range(len(rows[0]))]
+        lines = []
+        for row in rows:
+            lines.append('  '.join(row[col].ljust(widths[col]) if col < 2 else row[col].rjust(widths[col]) \
+                                   for col in range(len(row))))
+        if total['peak'] is not None:
+            lines.append('peak memory of the process: {:.1f} MB'.format(total['peak'] / 1048576.0))
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        out = open(path, 'w')
+        json.dump(OrderedDict([('devices', self.records), ('total', self.totals())]), out, indent=2)
+        out.close()
+
+
+# functions
+def scriptHash():
+    # changes to this script invalidate cached symbols
+    global scriptDigest
+    if scriptDigest is None:
+        f = open(os.path.splitext(os.path.abspath(__file__))[0] + '.py', 'rb')
+        scriptDigest = hashlib.sha1(f.read()).hexdigest()
+        f.close()
+    return scriptDigest
+
+scriptDigest = None
+
+def currentMemory():
+    # resident memory of the process in bytes from /proc, else the growth of the high water mark
+    try:
+        f = open('/proc/self/statm', 'r')
+        try:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        finally:
+            f.close()
+    except (IOError, OSError, ValueError, IndexError):
+        return peakMemory()
+
+def peakMemory():
+    # high water mark of the whole process in bytes, never goes down
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss                              # bytes on mac, kB everywhere else
+    return rss * 1024
+
+def globRegex(pattern):
+    rx = fnmatch.translate(pattern)
+    if rx.endswith('(?ms)'):                # python 2 appends the flags, they are set for the combined regex
+        rx = rx[:-5]
+    return rx
+
+def makeClassifiers(gnd, vdd, clk, nc, cacheSize=classifierCacheSize):
+    # pin function -> (symbol, orientation) and group name -> side of the device
+    pinTypes = PinClassifier([(gnd, ('W', 'U')), (vdd, ('W', 'D')), (clk, ('C C', '')), (nc, ('N', ''))], ('B', ''), cacheSize)
+    groupSides = PinClassifier([(gnd, 'U'), (vdd, 'D'), ([], 'R'), (nc, 'L')], None, cacheSize)
+    return pinTypes, groupSides
+
+def loadPinRules(path):
+    # [pins] section with comma separated patterns for gnd, vdd, clk and nc
+    cfg = ConfigParser.RawConfigParser()
+    if len(cfg.read(path)) == 0:
+        raise IOError('Cannot read config file ' + path)
+    rules = {}
+    for key in ['gnd', 'vdd', 'clk', 'nc']:
+        if cfg.has_option('pins', key):
+            rules[key] = [s.strip() for s in cfg.get('pins', key).split(',') if not s.strip() == '']
+    return rules
+
+optionNames = ['xMinOffset', 'yOffset', 'gridSize', 'pinGroupSanitize', 'autoSanitize', 'yGroupOffset', 'pinLength', 'pinTextSize', \
+               'singleGroups', 'makeRec', 'makeUnits', 'addTxt', 'allPackages', 'outputFormat']
+
+def loadOptions(path):
+    # [options] section with PARAMS from above, e.g. pinGroupSanitize = 4 or addTxt = 8,10
+    cfg = ConfigParser.RawConfigParser()
+    if len(cfg.read(path)) == 0:
+        raise IOError('Cannot read config file ' + path)
+    defaults = Options()
+    names = dict((name.lower(), name) for name in optionNames)
+    params = {}
+    if not cfg.has_section('options'):
+        return params
+    for key, val in cfg.items('options'):
+        name = names.get(key.lower())
+        if name is None:
+            raise ValueError('Unknown option ' + key + ' in ' + path)
+        default = getattr(defaults, name)
+        if isinstance(default, bool):
+            params[name] = cfg.getboolean('options', key)
+        elif isinstance(default, list):
+            params[name] = [int(n) for n in val.split(',') if not n.strip() == '']
+        elif isinstance(default, float):
+            params[name] = float(val)
+        elif isinstance(default, str):
+            params[name] = val.strip()
         else:
-            destPath = sys.argv[cidx]
-                       
-        cidx += 1
-            
-if sourcePath == '':
-    print 'Input .txt file not specified! Call with -h for help!'
-    quit()
-if destPath == '':
-    destPath = sourcePath.strip('.txt') + '.lib'
-    destOverride = True
-else:
-    destOverride = False
-source = open(sourcePath, 'r')
-
-if len(cmdaddTxt) > 0:
-    addTxt = cmdaddTxt
-if not cmdSanit == -1:
-    pinGroupSanitize = cmdSanit
-
-  
-destNew = not(os.path.isfile(destPath)) or destOverride
-oldTxt = ''
-if not destNew:
-    dest = open(destPath, 'r+')
-    oldTxt = dest.read()
-    backup = destPath.strip('.lib') + '_old.lib'
-    if not os.path.isfile(backup):
-        destOld = open(backup, 'w')
-        destOld.write(oldTxt)
-        destOld.close
-else:
-    dest = open(destPath, 'w')
-    
-FPs = []
-currFP = None
-ok = 0
-device = ""
-first = 1
-for line in source:
-    if line.startswith("\"Pin Information"):
-        device = line.split()[6]
-        continue
-        
-    if line.startswith("Bank Number"):
-        if first == 0:
-            idx = 1
-            currFP.updateMapping(singleGroups and makeUnits)
-            FPs.append(currFP) 
-            
-        ok = True
-        currFP = FP(line.split("\t")[7], pinGroupSanitize)
-        #print "\nreading Footprint:", currFP.name
-        continue
-    
-    if line.startswith('Note') or line.strip() == '':
-        ok = False
-        continue
-        
-    if ok:
-        first = 0
-            
-        currLine = line.split("\t")
-        pF = currLine[2].strip('\"')
-        pID = currLine[7].strip('\"')
-        aTxt = ''
-        for col in addTxt:
-            if not currLine[col] == '':
-                aTxt += ',' + currLine[col]
-        
-        if any(fnmatch.fnmatch(pF, s) for s in pwrPinGND):
-            symbol = 'W'
-            orientation = 'U'
-        elif any(fnmatch.fnmatch(pF, s) for s in pwrPinVDD):
-            symbol = 'W'
-            orientation = 'D'
-        elif any(fnmatch.fnmatch(pF, s) for s in clkPin):
-            symbol = 'C C'
-            orientation = ''
-        elif any(fnmatch.fnmatch(pF, s) for s in ncPin):
-            symbol = 'N'
-            orientation = ''
+            params[name] = int(val)
+    return params
+
+def makeOptions(configPath, overrides):
+    # defaults < config file < command line
+    params = {}
+    if not configPath == '':
+        params.update(loadOptions(configPath))
+    params.update(overrides)
+    opts = Options(**params)
+    if opts.outputFormat not in libFormats:
+        raise ValueError('Unknown output format ' + opts.outputFormat)
+    if not configPath == '':
+        opts.setPinRules(loadPinRules(configPath))
+    return opts
+
+def packageColumns(header):
+    # package columns start at column 7 and look like F484, U672, ...
+    cols = header.rstrip('\r\n').split('\t')
+    pkgs = []
+    for col in range(7, len(cols)):
+        name = cols[col].strip().strip('\"')
+        if re.match(r'[A-Z]+[0-9]+$', name) is None:
+            break
+        pkgs.append((col, name))
+    if len(pkgs) == 0:
+        pkgs.append((7, cols[7]))
+    return pkgs
+
+def mm(mils):
+    txt = '{:.4f}'.format(mils * 0.0254).rstrip('0').rstrip('.')
+    if txt == '-0':
+        return '0'
+    return txt
+
+def quoted(txt):
+    return txt.replace('\\', '\\\\').replace('\"', '\\\"')
+
+def unquoted(txt):
+    if not '\\' in txt:
+        return txt
+    return re.sub(r'\\(.)', r'\1', txt)
+
+def symbolName(device, fp):
+    return '{}_{}'.format(device, fp.name)
+
+def contentHash(txt):
+    return hashlib.sha1(txt).hexdigest()
+
+def updateLibrary(path, symbols, fmt=outputFormat):
+    # replace regenerated symbols in place, skip unchanged ones, append new ones
+    oldFile = open(path, 'rb')
+    index = libFormats[fmt].index(oldFile.read())
+    oldFile.close()
+    newSymbols = OrderedDict(symbols)
+    aliases = set()                             # old symbols of these names are now aliases, see dedupSymbols()
+    for name, txt in symbols:
+        aliases.update(libFormats[fmt].aliasNames(txt))
+    written = set()
+    added = 0
+    replaced = 0
+    skipped = 0
+    dropped = 0
+    chunks = []
+    pos = 0
+    for name, start, end in index.blocks:
+        if name not in newSymbols:
+            if name in aliases:
+                chunks.append(index.txt[pos:start])
+                dropped += 1
+                pos = end
+            continue
+        chunks.append(index.txt[pos:start])
+        if name in written:
+            dropped += 1                        # duplicate appended by an earlier run
+        elif newSymbols[name] == index.txt[start:end]:
+            chunks.append(index.txt[start:end])
+            skipped += 1
         else:
-            symbol = 'B'
-            orientation = ''
-            
-        if singleGroups:
-            orientation = 'R'
-            
-        pG = currLine[0] 
-            
-        currFP.addPin(pID, pF, pG, symbol, orientation, aTxt)
-        
-# last line
-idx = 1
-currFP.updateMapping(singleGroups and makeUnits)
-FPs.append(currFP)
-
-source.close()
-print "Imported", device, "with", len(FPs), "device(s)"
-
-# write into library
-
-libTxt = ""
-if destNew:
-    libTxt = 'EESchema-LIBRARY Version 2.3\n' \
-             '#encoding utf-8\n'             
-
-FPID = 1
-for FP in FPs:
-    startPos = len(libTxt)
-    #calcPhysLayout(self, tPins, bPins, rPins, lPins, xPins, groupOffset, pinOffset, pinTextSize, pinLength):
-    print 'Calculating Layout of device', FPID, '...'
-    if not singleGroups:
-        dims = FP.calcPhysLayout(pwrPinVDD, pwrPinGND, ncPin, '', '', yGroupOffset, yOffset, pinTextSize, pinLength)
-        if dims[0] >= dims[1]:
-            sizeX = dims[0]
+            chunks.append(newSymbols[name])
+            replaced += 1
+        written.add(name)
+        pos = end
+    chunks.append(index.txt[pos:index.tail])
+    for name, txt in newSymbols.iteritems():
+        if name not in written:
+            chunks.append(txt)
+            added += 1
+    chunks.append(index.txt[index.tail:])
+    if added + replaced + dropped > 0:
+        out = AtomicFile(path)
+        for chunk in chunks:
+            out.write(chunk)
+        out.commit()
+    return added, replaced, skipped, dropped
+
+shardModes = ['device', 'package']
+
+def shardFile(name, txt, mode, fmt=outputFormat):
+    if mode == 'package':
+        name = libFormats[fmt].symbolInfo(txt)[0]
+    return re.sub(r'[^A-Za-z0-9_.+-]', '_', name) + libFormats[fmt].ext
+
+def writeShards(path, symbols, mode, fmt=outputFormat):
+    # one library per device or package in directory 'path' and manifest.json (symbol -> file, package, pins, hash)
+    # shards are updated like a single library, unchanged ones are not written -> shards written, shards in total
+    writer = libFormats[fmt]
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    shards = OrderedDict()
+    files = {}
+    for name, txt in symbols:
+        parent = writer.parentName(txt)
+        if parent in files:
+            fileName = files[parent]            # derived symbols only load next to their parent
+        else:
+            fileName = shardFile(name, txt, mode, fmt)
+        files[name] = fileName
+        shards.setdefault(fileName, []).append((name, txt))
+
+    manifestPath = os.path.join(path, 'manifest.json')
+    entries = {}
+    oldManifest = ''
+    if os.path.isfile(manifestPath):
+        f = open(manifestPath, 'r')
+        oldManifest = f.read()
+        f.close()
+        entries = json.loads(oldManifest, object_pairs_hook=OrderedDict).get('symbols', {})
+    written = 0
+    for fileName, shardSymbols in shards.iteritems():
+        shardPath = os.path.join(path, fileName)
+        if os.path.isfile(shardPath):
+            added, replaced, skipped, dropped = updateLibrary(shardPath, shardSymbols, fmt)
+            if added + replaced + dropped > 0:
+                written += 1
+        else:
+            writeLibrary(shardPath, shardSymbols, fmt)
+            written += 1
+        for name, txt in shardSymbols:
+            package, pins = writer.symbolInfo(txt)
+            entry = OrderedDict([('file', fileName), ('package', package), ('pins', pins), ('hash', contentHash(txt))])
+            parent = writer.parentName(txt)
+            if parent is not None:
+                entry['pins'] = entries[parent]['pins']
+                entry['aliasOf'] = parent
+            entries[name] = entry
+            for alias in writer.aliasNames(txt):
+                entries[alias] = OrderedDict(entry.items() + [('aliasOf', name)])
+    manifest = json.dumps(OrderedDict([('format', fmt), ('symbols', OrderedDict(sorted(entries.items())))]), \
+                          indent=2, separators=(',', ': ')) + '\n'
+    if not manifest == oldManifest:
+        out = AtomicFile(manifestPath)
+        out.write(manifest)
+        out.commit()
+    return written, len(shards)
+
+def dedupSymbols(symbols, fmt=outputFormat):
+    # symbols which only differ by their name are written once, the others become its aliases
+    # -> new symbols, number of aliases, bytes saved
+    unique = OrderedDict()                      # fingerprint -> (name, txt, aliases)
+    for name, txt in symbols:
+        key = contentHash(txt.replace(name, ''))
+        if key in unique:
+            unique[key][2].append(name)
         else:
-            sizeX = dims[1]
-        if dims[2] >= dims[3]:
-            sizeY = dims[2]
+            unique[key] = (name, txt, [])
+    deduped = []
+    numAliases = 0
+    for name, txt, aliases in unique.itervalues():
+        if len(aliases) > 0:
+            deduped.extend(libFormats[fmt].addAliases(name, txt, aliases))
+            numAliases += len(aliases)
         else:
-            sizeY = dims[3]
-        # calc start pos + 'gridify'
-        topX = int(round(((sizeX - dims[0]) / 2 - sizeX / 2) / gridSize) * gridSize + dims[4])
-        topY = int(round((sizeY / 2) / gridSize) * gridSize)
-        leftX = int(round((- sizeX / 2) / gridSize) * gridSize)
-        leftY = int(round((-(sizeY - dims[2]) / 2 + sizeY / 2) / gridSize) * gridSize - dims[6])
-        bottomX = int(round(((sizeX - dims[1]) / 2 - sizeX / 2) / gridSize) * gridSize + dims[5])
-        bottomY = int(round((- sizeY / 2) / gridSize) * gridSize)
-        rightX = int(round((sizeX / 2) / gridSize) * gridSize)
-        rightY = int(round((-(sizeY - dims[3]) / 2 + sizeY / 2) / gridSize) * gridSize - dims[7])
+            deduped.append((name, txt))
+    saved = sum(len(txt) for name, txt in symbols) - sum(len(txt) for name, txt in deduped)
+    return deduped, numAliases, saved
+
+def expectedPins(fp):
+    # parsed device -> {pin number: (name, type, unit)} as drawSymbol() writes them
+    return dict((pin.pinID, (pin.pinFunction + pin.addTxt, pin.symbol, fp.gUnitMapping.get(pin.actualGroup))) \
+                for pin in fp.pins)
+
+def comparePins(expected, actual):
+    # both sides by pin number -> missing, extra (unknown or twice in the library) and mismatched pin numbers
+    missing = sorted(number for number in expected if number not in actual)
+    extra = []
+    mismatched = []
+    for number, found in actual.iteritems():
+        want = expected.get(number)
+        if want is None or len(found) > 1:
+            extra.append(number)
+        if want is not None and not found[0] == want:
+            mismatched.append(number)
+    return missing, sorted(extra), sorted(mismatched)
+
+def verifyLibrary(lines, libPath, opts):
+    # pins of every device of the pinout against the pins in the library -> number of devices, failed devices
+    fmt = 'kicad_sym' if libPath.endswith(KicadSymWriter.ext) else 'lib'
+    f = open(libPath, 'rb')
+    symbols = libFormats[fmt].readPins(f.read())
+    f.close()
+    numDevices = 0
+    failed = 0
+    for fp in iterPinout(lines, opts):
+        name = symbolName(fp.device, fp)
+        numDevices += 1
+        actual = symbols.get(name)
+        if actual is None:
+            print name + ': not in library'
+            failed += 1
+            continue
+        expected = expectedPins(fp)
+        missing, extra, mismatched = comparePins(expected, actual)
+        if len(missing) + len(extra) + len(mismatched) == 0:
+            print name + ':', len(expected), 'pins ok'
+            continue
+        failed += 1
+        print name + ':', len(missing), 'missing,', len(extra), 'extra,', len(mismatched), 'mismatched pin(s)'
+        for number in missing:
+            print '\tmissing  {}\t{} (type {}, unit {})'.format(number, *expected[number])
+        for number in extra:
+            for found in actual[number]:
+                print '\textra    {}\t{} (type {}, unit {})'.format(number, *found)
+        for number in mismatched:
+            for field, want, found in zip(['name', 'type', 'unit'], expected[number], actual[number][0]):
+                if not want == found:
+                    print '\tmismatch {}\t{}: {} in pinout, {} in library'.format(number, field, want, found)
+    return numDevices, failed
+
+def layoutSymbol(fp, opts):
+    # spread out pin groups keep their own positions, only the single block device is laid out up front
+    if opts.singleGroups:
+        return None
+    layout = Layout()
+    dims = fp.calcPhysLayout(opts.classifiers()[1], opts.yGroupOffset, opts.yOffset, opts.pinTextSize, opts.pinLength)
+    if dims[0] >= dims[1]:
+        sizeX = dims[0]
+    else:
+        sizeX = dims[1]
+    if dims[2] >= dims[3]:
+        sizeY = dims[2]
+    else:
+        sizeY = dims[3]
+    # calc start pos + 'gridify'
+    layout.topX = int(round(((sizeX - dims[0]) / 2 - sizeX / 2) / opts.gridSize) * opts.gridSize + dims[4])
+    layout.topY = int(round((sizeY / 2) / opts.gridSize) * opts.gridSize)
+    layout.leftX = int(round((- sizeX / 2) / opts.gridSize) * opts.gridSize)
+    layout.leftY = int(round((-(sizeY - dims[2]) / 2 + sizeY / 2) / opts.gridSize) * opts.gridSize - dims[6])
+    layout.bottomX = int(round(((sizeX - dims[1]) / 2 - sizeX / 2) / opts.gridSize) * opts.gridSize + dims[5])
+    layout.bottomY = int(round((- sizeY / 2) / opts.gridSize) * opts.gridSize)
+    layout.rightX = int(round((sizeX / 2) / opts.gridSize) * opts.gridSize)
+    layout.rightY = int(round((-(sizeY - dims[3]) / 2 + sizeY / 2) / opts.gridSize) * opts.gridSize - dims[7])
+    return layout
+
+def writeSymbol(out, device, fp, layout, opts):
+    drawSymbol(libFormats[opts.outputFormat](out), device, fp, layout, opts)
+
+def drawSymbol(sink, device, fp, layout, opts):
+    # header first, then the body is streamed to the format writer group by group
+    singleGroups = opts.singleGroups
+    makeRec = opts.makeRec
+    makeUnits = opts.makeUnits
+    xMinOffset = opts.xMinOffset
+    yOffset = opts.yOffset
+    yGroupOffset = opts.yGroupOffset
+    gridSize = opts.gridSize
+    pinLength = opts.pinLength
+    pinTextSize = opts.pinTextSize
+    if singleGroups:
+        devTxtOffsetX = 0
+        devTxtOffsetY = 400
+        devTxtAlign = 'L'
+    if not singleGroups:
+        devTxtOffsetX = 0
+        devTxtOffsetY = 100
+        devTxtAlign = 'C'
         
+    sink.begin(symbolName(device, fp), fp.name, fp.gUnitMapping.get(fp.pinGroups[-1]), \
+               devTxtOffsetX, devTxtOffsetY, devTxtAlign, '*BGA*')
+
+    if not singleGroups:
+        topX, topY = layout.topX, layout.topY
+        leftX, leftY = layout.leftX, layout.leftY
+        bottomX, bottomY = layout.bottomX, layout.bottomY
+        rightX, rightY = layout.rightX, layout.rightY
+
     distX = 0
     distY = 0
     xOffsetOverride = xMinOffset
-    lastGroup = FP.pins[0].actualGroup
+    lastGroup = None
     lastGroupSize = 0
-    lastGroupIdx = 0
     lastGroupTxtLen = 0
-    numGroups = 0
-    currIdx = 0
-    while currIdx < len(FP.pins):
-        pin = FP.pins[currIdx]
-        #print 'curr Pin:', pin.pinID, '\t\t', pin.pinFunction, '\t\t ->', pin.actualGroup
-        if not(FP.pins[currIdx - 1].actualGroup == pin.actualGroup):
-            currGroup = pin.actualGroup
-                
+    lastOrientation = ''
+    symbolNames = pinSymbols.names
+    # a group only starts a new column (label, cursors) if there are at least two of them
+    newGroups = len(fp.pinGroups) > 1
+    for currGroup in fp.pinGroups:
+        pins = fp.groups[currGroup].pins
+        unit = fp.gUnitMapping.get(currGroup)
+        orientation = pins[0].orientation       # same for all pins of a group
+        if newGroups:
             if singleGroups:
                 # Rectangle
-                if makeRec and not currIdx == 0:
-                    libTxt += 'S {} {} {} {} {} 1 {} N\n' \
-                                .format(str(distX + pinLength), str(int(distY - lastGroupSize * yOffset + gridSize)), \
-                                str(int(distX + pinLength + lastGroupTxtLen * pinTextSize + gridSize)), \
-                                str(int(distY)), str(FP.gUnitMapping.get(lastGroup)), int(pinTextSize / 5))
+                if makeRec and lastGroup is not None:
+                    sink.rect(distX + pinLength, int(distY - lastGroupSize * yOffset + gridSize), \
+                              int(distX + pinLength + lastGroupTxtLen * pinTextSize + gridSize), \
+                              int(distY), fp.gUnitMapping.get(lastGroup), int(pinTextSize / 5))
                 
                 if makeUnits:
                     distY = 0
@@ -439,158 +1413,866 @@ for FP in FPs:
                         xOffsetOverride = xMinOffset
                         distY = 0
                         
-                libTxt += 'T 0 {} {} {} 0 {} 0 {} Normal 0 L B\n' \
-                    .format(str(distX + pinLength), str(int(distY - 1.5 * yOffset)), str(pinTextSize), str(FP.gUnitMapping.get(currGroup)), pin.actualGroup)
+                sink.text(0, distX + pinLength, int(distY - 1.5 * yOffset), pinTextSize, unit, currGroup, 'L', 'B')
             
             else:
                 # store new current values
-                if not currIdx == 0:
-                    if FP.pins[currIdx - 1].orientation == 'U':
-                        if gSize > 1:
-                            libTxt += 'T 900 {} {} {} 0 1 0 {} Normal 0 L C\n' \
-                                .format(str(int(distX - (lastGroupSize + 1) * gridSize)), \
-                                str(int(distY + pinLength + gridSize)), str(int(pinTextSize)), FP.pins[currIdx - 1].actualGroup)
+                if lastGroup is not None:
+                    if lastOrientation == 'U':
+                        if lastGroupSize > 1:
+                            sink.text(900, int(distX - (lastGroupSize + 1) * gridSize), int(distY + pinLength + gridSize), \
+                                      int(pinTextSize), 1, lastGroup, 'L', 'C')
                         bottomX = distX
                         bottomY = distY
-                    elif FP.pins[currIdx - 1].orientation == 'D':
-                        if gSize > 1:
-                            libTxt += 'T 900 {} {} {} 0 1 0 {} Normal 0 R C\n' \
-                                .format(str(int(distX - (lastGroupSize + 1) * gridSize)), \
-                                str(int(distY - pinLength - gridSize)), str(int(pinTextSize)), FP.pins[currIdx - 1].actualGroup)
+                    elif lastOrientation == 'D':
+                        if lastGroupSize > 1:
+                            sink.text(900, int(distX - (lastGroupSize + 1) * gridSize), int(distY - pinLength - gridSize), \
+                                      int(pinTextSize), 1, lastGroup, 'R', 'C')
                         topX = distX
                         topY = distY
-                    elif FP.pins[currIdx - 1].orientation == 'L':
-                        if gSize > 1:
-                            libTxt += 'T 0 {} {} {} 0 1 0 {} Normal 0 R C\n' \
-                                .format(str(int(distX - pinLength - gridSize)), \
-                                str(int(distY + (lastGroupSize + 1) * gridSize)), str(int(pinTextSize)), FP.pins[currIdx - 1].actualGroup)
+                    elif lastOrientation == 'L':
+                        if lastGroupSize > 1:
+                            sink.text(0, int(distX - pinLength - gridSize), int(distY + (lastGroupSize + 1) * gridSize), \
+                                      int(pinTextSize), 1, lastGroup, 'R', 'C')
                         rightX = distX
                         rightY = distY
-                    elif FP.pins[currIdx - 1].orientation == 'R':
-                        if gSize > 1:
-                            libTxt += 'T 0 {} {} {} 0 1 0 {} Normal 0 L C\n' \
-                                .format(str(int(distX + pinLength + gridSize)), \
-                                str(int(distY + (lastGroupSize + 1) * gridSize)), str(int(pinTextSize)), FP.pins[currIdx - 1].actualGroup)
+                    elif lastOrientation == 'R':
+                        if lastGroupSize > 1:
+                            sink.text(0, int(distX + pinLength + gridSize), int(distY + (lastGroupSize + 1) * gridSize), \
+                                      int(pinTextSize), 1, lastGroup, 'L', 'C')
                         leftX = distX
                         leftY = distY
                         
                 # set new coordinates
-                gSize = FP.getGroupSize(pin.actualGroup)
-                if pin.orientation == 'U':    # GND
+                if orientation == 'U':    # GND
                     distX = bottomX - yGroupOffset
                     distY = bottomY
-                elif pin.orientation == 'D':  # VDD
+                elif orientation == 'D':  # VDD
                     distX = topX - yGroupOffset
                     distY = topY
-                elif pin.orientation == 'L':
+                elif orientation == 'L':
                     distX = rightX
                     distY = rightY + yGroupOffset
-                elif pin.orientation == 'R':
+                elif orientation == 'R':
                     distX = leftX
                     distY = leftY + yGroupOffset                      
-                
-            lastGroupTxtLen = 0
-            lastGroupSize = 0
-            lastGroupIdx = currIdx
-            numGroups += 1
-            # end if singleGroup  
         
-        lastGroupSize += 1
-            
-        libTxt += 'X {} {} {} {} {} {} {} {} {} 1 {}\n' \
-                    .format(pin.pinFunction + pin.addTxt, pin.pinID, str(distX), str(distY), \
-                        str(pinLength), pin.orientation, str(pinTextSize), str(pinTextSize), str(FP.gUnitMapping.get(pin.actualGroup)), pin.symbol)
-        if singleGroups:
-            distY += yOffset
+        # coordinates of the whole group at once: a column (single groups, left, right) or a row (top, bottom)
+        size = len(pins)
+        steps = [k * yOffset for k in xrange(size)]
+        if singleGroups or orientation == 'R' or orientation == 'L':
+            xs = [distX] * size
+            ys = [distY + step for step in steps]
+            distY += size * yOffset
+        elif orientation == 'U' or orientation == 'D':
+            xs = [distX - step for step in steps]
+            ys = [distY] * size
+            distX -= size * yOffset
         else:
-            if pin.orientation == 'U' or pin.orientation == 'D':
-                distX -= yOffset
-            elif pin.orientation == 'R' or pin.orientation == 'L':
-                distY += yOffset
-        lastGroup = pin.actualGroup
-        if len(pin.pinFunction) + len(pin.addTxt) >= lastGroupTxtLen:
-            lastGroupTxtLen = len(pin.pinFunction) + len(pin.addTxt)
-        
-        currIdx += 1
-        # end while
+            xs = [distX] * size
+            ys = [distY] * size
+        names = [pin.pinFunction + pin.addTxt for pin in pins]
+        sink.pins(names, [pin.pinID for pin in pins], xs, ys, pinLength, orientation, pinTextSize, unit, \
+                  [symbolNames[pin.symbolCode] for pin in pins])
+        lastGroup = currGroup
+        lastGroupSize = size
+        lastGroupTxtLen = max([len(name) for name in names])
+        lastOrientation = orientation
         
     # last Rectangle
     if singleGroups and makeRec:
-        libTxt += 'S {} {} {} {} {} 1 {} N\n' \
-                    .format(str(distX + pinLength), str(int(distY - lastGroupSize * yOffset + gridSize)), \
-                    str(int(distX + pinLength + lastGroupTxtLen * pinTextSize + gridSize)), \
-                    str(int(distY)), str(FP.gUnitMapping.get(lastGroup)), int(pinTextSize / 5))
+        sink.rect(distX + pinLength, int(distY - lastGroupSize * yOffset + gridSize), \
+                  int(distX + pinLength + lastGroupTxtLen * pinTextSize + gridSize), \
+                  int(distY), fp.gUnitMapping.get(lastGroup), int(pinTextSize / 5))
     if not singleGroups:
-        libTxt += 'S {} {} {} {} 1 1 {} N\n' \
-                    .format(str(int(leftX + pinLength)), str(int(topY - pinLength)), \
-                    str(int(rightX - pinLength)), str(int(bottomY + pinLength)), int(pinTextSize / 5))
+        sink.rect(int(leftX + pinLength), int(topY - pinLength), int(rightX - pinLength), int(bottomY + pinLength), \
+                  1, int(pinTextSize / 5))
         
-    libTxt += 'ENDDRAW\n' \
-              'ENDDEF\n'    
+    sink.end()
         
-    if singleGroups:
-        devTxtOffsetX = 0
-        devTxtOffsetY = 400
-        devTxtAlign = 'L'
-    if not singleGroups:
-        devTxtOffsetX = 0
-        devTxtOffsetY = 100
-        devTxtAlign = 'C'
+
+compressedExts = ['.gz', '.bz2', '.xz']
+
+def openPinout(path):
+    # '-' is stdin, .gz, .bz2 and .xz files are decompressed while they are read
+    if path == '-':
+        return sys.stdin
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.gz':
+        return io.BufferedReader(gzip.open(path, 'rb'), ioBuffer)
+    if ext == '.bz2':
+        return bz2.BZ2File(path, 'rb', ioBuffer)
+    if ext == '.xz':
+        if lzma is None:
+            raise IOError('.xz pinouts need the lzma module (pip install backports.lzma)')
+        return io.BufferedReader(lzma.open(path, 'rb'), ioBuffer)
+    return open(path, 'rb')
+
+def readPinout(path):
+    f = openPinout(path)
+    try:
+        return f.read()
+    finally:
+        if not f is sys.stdin:
+            f.close()
+
+def pinoutBase(path):
+    # 'pinouts/5CEBA4.txt.gz' -> 'pinouts/5CEBA4'
+    root, ext = os.path.splitext(path)
+    if ext.lower() in compressedExts:
+        root, ext = os.path.splitext(root)
+    return root
+
+def libraryPath(sourcePath, fmt=outputFormat):
+    # default output next to the pinout, stdout for stdin
+    if sourcePath == '-':
+        return '-'
+    return pinoutBase(sourcePath) + libFormats[fmt].ext
+
+def pinoutLines(path):
+    # lines of a pinout file through mmap, the file is never read into memory as a whole
+    # stdin and compressed files are read line by line from the stream
+    if path == '-' or os.path.splitext(path)[1].lower() in compressedExts:
+        f = openPinout(path)
+        try:
+            for line in f:
+                yield line
+        finally:
+            if not f is sys.stdin:
+                f.close()
+        return
+    f = open(path, 'rb')
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            return                              # empty files cannot be mapped
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            line = m.readline()
+            while line:
+                yield line
+                line = m.readline()
+        finally:
+            m.close()
+    finally:
+        f.close()
+
+def bestSanitize(fp):
+    # largest pinGroupSanitize with at most maxUnits groups, else the one with the fewest groups
+    # -> FP regrouped with it (no reparsing), all candidates as [(pinGroupSanitize, groups)]
+    candidates = fp.sanitizeCandidates()
+    fits = [c for c in candidates if c[1] <= maxUnits]
+    if len(fits) > 0:
+        san = fits[-1][0]
+    else:
+        san = min(candidates, key=lambda c: (c[1], -c[0]))[0]
+    if san == fp.san:
+        return fp, candidates
+    return fp.regroup(san), candidates
+
+def finishBlock(device, currFPs, opts, prof=None):
+    # FPs of a block which got pins, ready for layout
+    done = []
+    units = opts.singleGroups and opts.makeUnits
+    for col, currFP in currFPs:
+        if len(currFP.pinGroups) > 0:
+            currFP.device = device
+            if opts.autoSanitize and units:     # only Kicad units are limited to maxUnits
+                if prof is not None:
+                    t = timer()
+                newFP, candidates = bestSanitize(currFP)
+                if prof is not None:
+                    prof.addGroupTime(currFP, timer() - t)
+                    prof.moveRecord(currFP, newFP)
+                currFP = newFP
+                print 'pinGroupSanitize for {}: {} -> {} groups (tried {})'.format(symbolName(device, currFP), currFP.san, \
+                        len(currFP.pinGroups), ', '.join(['{}: {}'.format(san, n) for san, n in candidates]))
+            currFP.updateMapping(units, opts.autoSanitize and units)
+            done.append(currFP)
+    return done
+
+def iterPinout(source, opts, prof=None, column=None):
+    # pinout lines -> FPs, each one as soon as its block ends ('Bank Number', 'Pin Information' or end of file)
+    # with allPackages and 'column' only the FP of this package column is built
+    pinTypes = opts.classifiers()[0]
+    currFPs = []                                # (package column, FP) of the current block
+    ok = False
+    device = ''
+    # only the columns in use are split off, the rest of the line stays in one piece
+    maxSplit = max([0, 2, 7] + opts.addTxt) + 1
+    for line in source:
+        if line.startswith("\"Pin Information") or line.startswith("Bank Number"):
+            if len(currFPs) > 0:
+                done = finishBlock(device, currFPs, opts, prof)
+                if prof is not None:
+                    prof.endBlock(device, done, block, opts)
+                for currFP in done:
+                    yield currFP
+                currFPs = []
+            ok = False
+
+        if line.startswith("\"Pin Information"):
+            device = line.split()[6]
+            continue
         
-    libTxt = libTxt[:startPos] + '#\n' \
-              '# {}_{}\n' \
-              '#\n' \
-              'DEF {}_{} U 0 40 Y Y {} L N\n' \
-              'F0 \"U\" {} {} 60 H V {} CNN\n' \
-              'F1 \"{}_{}\" {} {} 60 H V {} CNN\n' \
-              'F2 \"{}\" {} {} 60 H V {} CIN\n' \
-              'F3 \"~\" {} {} 60 H V {} CNN\n' \
-              '$FPLIST\n' \
-              ' {}\n' \
-              '$ENDFPLIST\n' \
-              'DRAW\n' \
-                    .format(device, FP.name, \
-                    device, FP.name, str(FP.gUnitMapping.get(FP.pinGroups[-1])), \
-                    devTxtOffsetX, devTxtOffsetY, devTxtAlign, \
-                    device, FP.name, devTxtOffsetX, devTxtOffsetY - 100, devTxtAlign, \
-                    FP.name, devTxtOffsetX, devTxtOffsetY - 200, devTxtAlign, \
-                    devTxtOffsetX, devTxtOffsetY - 300, devTxtAlign, \
-                    '*BGA*') \
-               + libTxt[startPos:]
-    
-    print '... done.', len(FP.pinGroups), 'pin groups and', len(FP.pins), 'pins found.' 
-    FPID += 1
-    #print FP.pinGroups
-    # end for
-
-if destNew:
-    libTxt += '#\n' \
-              '#End Library'
-    dest.write(libTxt)
-else:
-    places = list(find_all(oldTxt, 'ENDDEF'))
-    oldTxt = oldTxt[:places[-1] + 7] + libTxt + '\n' + oldTxt[places[-1] + 7:]
-    dest.write(oldTxt)
+        if line.startswith("Bank Number"):
+            if prof is not None:
+                block = prof.start(opts)
+            ok = True
+            if opts.allPackages:
+                currFPs = [(col, FP(name, opts.pinGroupSanitize)) for col, name in packageColumns(line) \
+                           if column is None or col == column]
+                maxSplit = max([0, 2] + [col for col, currFP in currFPs] + opts.addTxt) + 1
+            else:
+                currFPs = [(7, FP(line.split("\t")[7], opts.pinGroupSanitize))]
+            continue
     
-dest.close()
-print 'Export successful!'
+        if line.startswith('Note') or line.strip() == '':
+            ok = False
+            continue
+        
+        if ok:
+            # split and classify once, shared by all packages
+            currLine = line.split("\t", maxSplit)
+            pF = currLine[2].strip('\"')
+            aTxt = ''
+            for col in opts.addTxt:
+                if not currLine[col] == '':
+                    aTxt += ',' + currLine[col]
+        
+            symbol, orientation = pinTypes.classify(pF)
+            
+            if opts.singleGroups:
+                orientation = 'R'
+            
+            pG = currLine[0] 
+            
+            for col, currFP in currFPs:
+                pID = currLine[col].strip('\"')
+                if opts.allPackages and pID.strip() == '':
+                    continue                        # not bonded in this package
+                if prof is not None:
+                    t = timer()
+                currFP.addPin(pID, pF, pG, symbol, orientation, aTxt)
+                if prof is not None:
+                    prof.addGroupTime(currFP, timer() - t)
+        
+    # last block
+    if len(currFPs) > 0:
+        done = finishBlock(device, currFPs, opts, prof)
+        if prof is not None:
+            prof.endBlock(device, done, block, opts)
+        for currFP in done:
+            yield currFP
 
+def parsePinout(source, opts, prof=None):
+    # pinout lines -> name of the last device and all FPs, each FP knows its own device
+    FPs = list(iterPinout(source, opts, prof))
+    if len(FPs) == 0:
+        return '', FPs
+    return FPs[-1].device, FPs
 
+def renderSymbol(device, fp, layout, opts):
+    buf = cStringIO.StringIO()
+    writeSymbol(buf, device, fp, layout, opts)
+    return buf.getvalue()
 
+def renderDevice(fp, opts, prof=None):
+    # layout + render of one device (also the pool worker) -> symbol name, symbol text, number of groups and pins
+    if prof is None:
+        txt = renderSymbol(fp.device, fp, layoutSymbol(fp, opts), opts)
+    else:
+        token = prof.start(opts)
+        layout = layoutSymbol(fp, opts)
+        prof.stop(fp, 'layout', token, opts)
+        token = prof.start(opts)
+        txt = renderSymbol(fp.device, fp, layout, opts)
+        prof.stop(fp, 'emit', token, opts, len(txt))
+    return symbolName(fp.device, fp), txt, len(fp.pinGroups), len(fp.pins)
 
+def pinoutChunks(lines, allPackages=False):
+    # pinout lines -> work items (block number, lines, package column) which parse on their own:
+    # a 'Bank Number' table with the 'Pin Information' line of its device in front, with allPackages once per package
+    info = []
+    chunk = None
+    idx = 0
+    for line in lines:
+        newDevice = line.startswith("\"Pin Information")
+        if newDevice or line.startswith("Bank Number"):
+            if chunk is not None:
+                for item in blockItems(idx, chunk, allPackages):
+                    yield item
+                idx += 1
+                chunk = None
+            if newDevice:
+                info = [line]
+            else:
+                chunk = info + [line]
+        elif chunk is not None:
+            chunk.append(line)
+    if chunk is not None:
+        for item in blockItems(idx, chunk, allPackages):
+            yield item
 
+def blockItems(idx, chunk, allPackages):
+    if not allPackages:
+        return [(idx, chunk, None)]
+    header = chunk[1] if chunk[0].startswith("\"Pin Information") else chunk[0]
+    return [(idx, chunk, col) for col, name in packageColumns(header)]
 
+def convertChunk(item, opts):
+    # pool worker: parse, layout + render of one work item -> block number, messages printed meanwhile, results
+    idx, lines, column = item
+    stdout = sys.stdout
+    sys.stdout = cStringIO.StringIO()
+    try:
+        results = [renderDevice(fp, opts) for fp in iterPinout(lines, opts, column=column)]
+        return idx, sys.stdout.getvalue(), results
+    finally:
+        sys.stdout = stdout
 
+def blockResults(pending):
+    # messages of a whole block first, iterPinout() prints them all before it yields the FPs of the block
+    for messages, results in pending:
+        sys.stdout.write(messages)
+    for messages, results in pending:
+        for result in results:
+            yield result
 
+def convertDevices(lines, opts, jobs=1, prof=None):
+    # pinout lines -> renderDevice() results in file order
+    # with jobs > 1 the 'Bank Number' blocks, with allPackages every package of them, are converted in a worker pool,
+    # parsing included, as sending the raw lines to a worker is much cheaper than sending a parsed FP
+    if jobs == 1 or prof is not None:
+        for fp in iterPinout(lines, opts, prof):
+            yield renderDevice(fp, opts, prof)
+        return
+    chunks = pinoutChunks(lines, opts.allPackages)
+    head = list(itertools.islice(chunks, 2))
+    if len(head) < 2:
+        for idx, chunk, column in head:
+            for fp in iterPinout(chunk, opts, column=column):
+                yield renderDevice(fp, opts)
+        return
+    pool = multiprocessing.Pool(jobs)
+    try:
+        block = None
+        pending = []
+        for idx, messages, results in pool.imap(functools.partial(convertChunk, opts=opts), itertools.chain(head, chunks)):
+            if not idx == block:
+                for result in blockResults(pending):
+                    yield result
+                block = idx
+                pending = []
+            pending.append((messages, results))
+        for result in blockResults(pending):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
 
+def renderSymbols(FPs, opts, prof=None):
+    # layout + render of all devices -> [(symbol name, symbol text)], FPs can be a generator
+    return [renderDevice(fp, opts, prof)[:2] for fp in FPs]
 
+def convertPinout(source, opts=None):
+    # whole chain for in-process callers: pinout lines -> [(symbol name, symbol text)]
+    if opts is None:
+        opts = Options()
+    return renderSymbols(iterPinout(source, opts), opts)
 
+def writeLibrary(path, symbols, fmt=outputFormat):
+    out = openLibrary(path)
+    out.write(libFormats[fmt].header)
+    for name, txt in symbols:
+        out.write(txt)
+    out.write(libFormats[fmt].footer)
+    out.commit()
 
+def convertCached(path, opts, cache, jobs=1):
+    # -> symbols and whether they came from the cache
+    data = readPinout(path)
+    key = cache.key(data, opts)
+    symbols = cache.get(key)
+    if symbols is not None:
+        return symbols, True
+    symbols = [result[:2] for result in convertDevices(cStringIO.StringIO(data), opts, jobs)]
+    if len(symbols) == 0:
+        raise ValueError('no pin table found')
+    cache.put(key, symbols)
+    return symbols, False
 
+def convertFile(path, opts, cache=None, prof=None):
+    # batch worker: errors are returned with the path instead of raised, so one bad file does not stop the run
+    try:
+        if cache is not None:
+            return path, convertCached(path, opts, cache)[0], None
+        if prof is not None:
+            prof.path = path
+        symbols = renderSymbols(iterPinout(pinoutLines(path), opts, prof), opts, prof)
+        if len(symbols) == 0:
+            raise ValueError('no pin table found')
+        return path, symbols, None
+    except Exception:
+        return path, None, ''.join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
 
+def batchFiles(pattern):
+    if os.path.isdir(pattern):
+        return sorted(path for ext in [''] + compressedExts for path in glob.glob(os.path.join(pattern, '*.txt' + ext)))
+    return sorted(glob.glob(pattern))
 
+def convertBatch(paths, destDir, mergePath, jobs, opts, cache=None, prof=None, dedup=False, shard=''):
+    # results come back in the order of 'paths', whatever order the workers finish in
+    job = functools.partial(convertFile, opts=opts, cache=cache, prof=prof)
+    if jobs > 1 and len(paths) > 1 and prof is None:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap(job, paths)
+    else:
+        pool = None
+        results = itertools.imap(job, paths)
+    merged = OrderedDict()                      # same rule as updateLibrary(): the last symbol of a name wins
+    sources = {}                                # symbol name -> pinout it was merged from
+    failed = []
+    numAliases = 0
+    saved = 0
+    for path, symbols, error in results:
+        if error is not None:
+            print 'FAILED', path + ':', error
+            failed.append(path)
+            continue
+        print 'Converted', path, 'with', len(symbols), 'device(s)'
+        if mergePath == '' and shard == '':
+            if dedup:
+                symbols, n, size = dedupSymbols(symbols, opts.outputFormat)
+                numAliases += n
+                saved += size
+            libDir = destDir or os.path.dirname(path)
+            libPath = os.path.basename(libraryPath(path, opts.outputFormat))
+            try:
+                if not libDir == '' and not os.path.isdir(libDir):
+                    os.makedirs(libDir)
+                writeLibrary(os.path.join(libDir, libPath), symbols, opts.outputFormat)
+            except EnvironmentError:
+                print 'FAILED', path + ':', ''.join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
+                failed.append(path)
+        else:
+            for name, txt in symbols:
+                if name in sources:
+                    print 'Warning:', name, 'of', path, 'replaces the one of', sources[name]
+                merged[name] = txt
+                sources[name] = path
+    if pool is not None:
+        pool.close()
+        pool.join()
+    merged = merged.items()
+    if not (mergePath == '' and shard == '') and dedup:
+        merged, numAliases, saved = dedupSymbols(merged, opts.outputFormat)
+    if dedup:
+        reportDedup(numAliases, saved)
+    if not shard == '':
+        reportShards(destDir, writeShards(destDir, merged, shard, opts.outputFormat))
+    elif not mergePath == '':
+        if os.path.isfile(mergePath):
+            updateLibrary(mergePath, merged, opts.outputFormat)
+        else:
+            if not os.path.dirname(mergePath) == '' and not os.path.isdir(os.path.dirname(mergePath)):
+                os.makedirs(os.path.dirname(mergePath))
+            writeLibrary(mergePath, merged, opts.outputFormat)
+    return failed
 
+def watchPinouts(pattern, libPath, configPath, overrides, interval=watchInterval, shard=''):
+    # poll the pinouts + config file, rebuild + write back only the symbols of what changed
+    files = OrderedDict()
+    opts = None
+    configStamp = None
+    while True:
+        optsChanged = False
+        if opts is None or not configPath == '':
+            try:
+                st = os.stat(configPath) if not configPath == '' else None
+                stamp = None if st is None else (st.st_mtime, st.st_size)
+                if opts is None or not stamp == configStamp:
+                    configStamp = stamp
+                    newOpts = makeOptions(configPath, overrides)
+                    if opts is None or not newOpts.cacheKey() == opts.cacheKey():
+                        opts = newOpts
+                        optsChanged = True
+                        if not configPath == '':
+                            print 'Loaded options from', configPath
+            except Exception:
+                print 'FAILED', configPath + ':', ''.join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
+                if opts is None:
+                    return
+        paths = batchFiles(pattern)
+        for path in files.keys():
+            if path not in paths:
+                print 'Removed', path + ', its symbols stay in', libPath
+                del files[path]
+        symbols = []
+        for path in paths:
+            wf = files.get(path)
+            if wf is None:
+                wf = WatchedFile(path)
+                files[path] = wf
+            if not wf.changed() and not optsChanged:
+                continue
+            start = timer()
+            try:
+                if wf.update(opts):
+                    symbols.extend(wf.symbols)
+                    print 'Converted', path, 'with', len(wf.symbols), 'device(s) in', \
+                          '{:.0f} ms'.format((timer() - start) * 1000)
+            except Exception:
+                print 'FAILED', path + ':', ''.join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
+        if len(symbols) > 0:
+            if not shard == '':
+                reportShards(libPath, writeShards(libPath, symbols, shard, opts.outputFormat))
+            elif os.path.isfile(libPath):
+                added, replaced, skipped, dropped = updateLibrary(libPath, symbols, opts.outputFormat)
+                print 'Updated library:', added, 'added,', replaced, 'replaced,', skipped, 'unchanged,', dropped, 'duplicates removed.'
+            else:
+                writeLibrary(libPath, symbols, opts.outputFormat)
+                print 'Written', libPath
+        time.sleep(interval)
+
+def reportShards(path, result):
+    print 'Written', result[0], 'of', result[1], 'shard(s) in', path
+
+def reportDedup(numAliases, saved):
+    print 'Deduplicated:', numAliases, 'symbol(s) written as aliases,', saved, 'bytes saved.'
+
+def reportProfile(prof, path):
+    if prof is None:
+        return
+    if path == '':
+        print prof.table()
+    else:
+        prof.dump(path)
+        print 'Profile written to', path
+
+def main(argv):
+    # cmd-line input
+    overrides = {}                              # options given on the command line
+    argc = len(argv)
+    cmdConfig = ''
+    batch = False
+    mergePath = ''
+    jobs = multiprocessing.cpu_count()
+    cache = None
+    clearCache = False
+    prof = None
+    profPath = ''
+    watch = False
+    dedup = False
+    shard = ''
+    verify = False
+    sourcePath = ''
+    destPath = ''
+    if argc == 1:
+        print 'At least specify input .txt file! Call with -h for help!'
+        quit()
+    if argc > 1:
+        cidx = 1
+        while cidx < argc:
+            if argv[cidx] == '-h':
+                print 'Command line options (optional in [brackets]):\n', \
+                    ' python alteraFP2escheema.py [<options>] <input file path> [<output file path>]\n', \
+                    '\t If <output file path> matches existing lib, part(s) will be added to this lib\n', \
+                    '\t or replace the parts of the same name in it.\n', \
+                    '\t - as <input file path> reads stdin, as <output file path> writes to stdout\n', \
+                    '\t (the default for stdin), .gz/.bz2/.xz input files are decompressed on the fly.\n', \
+                    '\tAv. options:\n', \
+                    '\t -a:\t specify column IDs in .txt/.pdf you want to \n', \
+                    '\t\tinclude as pin function text (1st col ID is 0)\n\t\te.g. -a 8,10,11\n', \
+                    '\t\tWarning: too many chars and Kicad cannot load library!\n', \
+                    '\t -s:\t pinGroupSanitize: if first n chars of pinFunction\n', \
+                    '\t\tare the same, group together\n\t\te.g. -s 4\n', \
+                    '\t --auto-sanitize:\t pick pinGroupSanitize per part: the largest\n', \
+                    '\t\tone with at most 26 pin groups (Kicad units A-Z),\n\t\tonly with singleGroups and makeUnits\n', \
+                    '\t -c:\t config file with pin type patterns, section [pins]\n', \
+                    '\t\twith keys gnd, vdd, clk, nc, and parameters, section\n', \
+                    '\t\t[options] with keys as in PARAMS of this script\n\t\te.g. -c pins.ini\n', \
+                    '\t -p:\t make a part for every package column in the file,\n', \
+                    '\t\tnot only for the first one\n', \
+                    '\t --format:\t library format, lib (EESchema-LIBRARY, default)\n', \
+                    '\t\tor kicad_sym (KiCad 6 and newer)\n\t\te.g. --format kicad_sym\n', \
+                    '\t -b:\t batch mode: <input file path> is a directory or a\n', \
+                    '\t\tquoted glob of pinout files, <output file path> the\n', \
+                    '\t\tdirectory for their libs (default: next to the inputs)\n\t\te.g. -b "pinouts/5CE*.txt" libs\n', \
+                    '\t -m:\t batch mode: merge all parts into this lib instead\n\t\te.g. -m cyclone5.lib\n', \
+                    '\t --dedup:\t write parts with identical pinouts only once, the\n', \
+                    '\t\tothers as ALIAS of the first (also across a batch)\n', \
+                    '\t --verify:\t check the pins of <output file path> against the\n', \
+                    '\t\tpinout (same options as for the conversion), nothing\n\t\tis written, exit code 1 if a pin differs\n', \
+                    '\t --shard:\t <output file path> is a directory with one lib\n', \
+                    '\t\tper device or per package and a manifest.json\n\t\te.g. --shard package\n', \
+                    '\t -j:\t number of worker processes for the files of a batch\n', \
+                    '\t\tor the pin tables / packages of a file (default: cores),\n', \
+                    '\t\t-j 1 does everything in this process\n\t\te.g. -j 4\n', \
+                    '\t --cache:\t reuse symbols of unchanged pinouts + options from\n', \
+                    '\t\t' + cacheDir + '\n', \
+                    '\t --cache-dir:\t same with another cache directory\n\t\te.g. --cache-dir /tmp/a2e\n', \
+                    '\t --cache-size:\t max. cache size in MB (default: ' + str(cacheSize) + ')\n', \
+                    '\t --clear-cache:\t remove all cached symbols\n', \
+                    '\t --watch:\t keep running, convert <input file path> (a file,\n', \
+                    '\t\tdirectory or quoted glob) into the lib <output file path>\n', \
+                    '\t\tagain whenever a pinout or the -c config file changes\n', \
+                    '\t --profile:\t print time + memory growth of reading, grouping,\n', \
+                    '\t\tlayout and output per device (no cache, one process)\n', \
+                    '\t --profile-json:\t same, written as JSON to the given file\n\t\te.g. --profile-json prof.json\n'
+                quit()
+            if argv[cidx] == '-a':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                overrides['addTxt'] = [int(n) for n in argv[cidx + 1].split(',')]
+                cidx += 1
+            elif argv[cidx] == '-s':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                overrides['pinGroupSanitize'] = int(argv[cidx + 1])
+                if overrides['pinGroupSanitize'] < 0:
+                    print 'Wrong argument! Call with -h for help!'
+                    quit()
+                cidx += 1
+            elif argv[cidx] == '--auto-sanitize':
+                overrides['autoSanitize'] = True
+            elif argv[cidx] == '-c':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                cmdConfig = argv[cidx + 1]
+                if not os.path.isfile(cmdConfig):
+                    print 'Config file not found! Call with -h for help!'
+                    quit()
+                cidx += 1
+            elif argv[cidx] == '-p':
+                overrides['allPackages'] = True
+            elif argv[cidx] == '--format':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                if argv[cidx + 1] not in libFormats:
+                    print 'Wrong argument! Call with -h for help!'
+                    quit()
+                overrides['outputFormat'] = argv[cidx + 1]
+                cidx += 1
+            elif argv[cidx] == '-b':
+                batch = True
+            elif argv[cidx] == '-m':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                mergePath = argv[cidx + 1]
+                cidx += 1
+            elif argv[cidx] == '-j':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                jobs = int(argv[cidx + 1])
+                if jobs < 1:
+                    print 'Wrong argument! Call with -h for help!'
+                    quit()
+                cidx += 1
+            elif argv[cidx] == '--cache':
+                if cache is None:
+                    cache = SymbolCache()
+            elif argv[cidx] == '--cache-dir':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                if cache is None:
+                    cache = SymbolCache()
+                cache.path = argv[cidx + 1]
+                cidx += 1
+            elif argv[cidx] == '--cache-size':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                if cache is None:
+                    cache = SymbolCache()
+                cache.maxSize = int(float(argv[cidx + 1]) * 1024 * 1024)
+                cidx += 1
+            elif argv[cidx] == '--clear-cache':
+                clearCache = True
+            elif argv[cidx] == '--watch':
+                watch = True
+            elif argv[cidx] == '--dedup':
+                dedup = True
+            elif argv[cidx] == '--verify':
+                verify = True
+            elif argv[cidx] == '--shard':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                shard = argv[cidx + 1]
+                if shard not in shardModes:
+                    print 'Wrong argument! Call with -h for help!'
+                    quit()
+                cidx += 1
+            elif argv[cidx] == '--profile':
+                prof = Profile()
+            elif argv[cidx] == '--profile-json':
+                if cidx == argc - 1:
+                    print 'Not enough arguments! Call with -h for help!'
+                    quit()
+                prof = Profile()
+                profPath = argv[cidx + 1]
+                cidx += 1
+            elif sourcePath == '':
+                sourcePath = argv[cidx]
+            else:
+                destPath = argv[cidx]
 
+            cidx += 1
+
+    try:
+        opts = makeOptions(cmdConfig, overrides)
+    except (IOError, ValueError, ConfigParser.Error) as e:
+        print 'Wrong config file:', e
+        quit()
+
+    if clearCache:
+        print 'Removed', (cache or SymbolCache()).clear(), 'cached pinout(s).'
+        if sourcePath == '':
+            return
+
+    if sourcePath == '':
+        print 'Input .txt file not specified! Call with -h for help!'
+        quit()
+    if prof is not None and cache is not None:
+        print 'Profiling: cache not used.'
+        cache = None
+    if opts.autoSanitize and not (opts.singleGroups and opts.makeUnits):
+        print 'Warning: auto-sanitize only applies to Kicad units (singleGroups and makeUnits), ignored.'
+    if not shard == '' and destPath == '':
+        print 'Output directory not specified! Call with -h for help!'
+        quit()
+    if '-' in [sourcePath, destPath, mergePath] and (batch or watch or not shard == ''):
+        print 'stdin/stdout only for a single pinout! Call with -h for help!'
+        quit()
+    if os.path.splitext(sourcePath)[1].lower() == '.xz' and lzma is None:
+        print '.xz pinouts need the lzma module (pip install backports.lzma)!'
+        quit()
+    if verify:
+        if destPath == '':
+            destPath = libraryPath(sourcePath, opts.outputFormat)
+        if not os.path.isfile(destPath):
+            print 'Library', destPath, 'not found! Call with -h for help!'
+            quit()
+        numDevices, failed = verifyLibrary(pinoutLines(sourcePath), destPath, opts)
+        print 'Verified', numDevices - failed, 'of', numDevices, 'device(s).'
+        if failed > 0:
+            sys.exit(1)
+        return
+    if watch:
+        libPath = mergePath or destPath
+        if libPath == '':
+            print 'Output library not specified! Call with -h for help!'
+            quit()
+        print 'Watching', sourcePath, 'and' if not cmdConfig == '' else '', cmdConfig, '(Ctrl-C to stop)'
+        try:
+            watchPinouts(sourcePath, libPath, cmdConfig, overrides, shard=shard)
+        except KeyboardInterrupt:
+            print 'Stopped watching.'
+        return
+    if batch:
+        paths = batchFiles(sourcePath)
+        if len(paths) == 0:
+            print 'No input files found! Call with -h for help!'
+            quit()
+        failed = convertBatch(paths, destPath, mergePath, jobs, opts, cache, prof, dedup, shard)
+        print 'Converted', len(paths) - len(failed), 'of', len(paths), 'files.'
+        reportProfile(prof, profPath)
+        if len(failed) > 0:
+            sys.exit(1)
+        return
+
+    if destPath == '':
+        destPath = libraryPath(sourcePath, opts.outputFormat)
+        destOverride = True
+    else:
+        destOverride = False
+    if destPath == '-':
+        sys.stdout = sys.stderr                 # messages must not end up in the library
+    destNew = destPath == '-' or not(os.path.isfile(destPath)) or destOverride
+    if cache is not None:
+        try:
+            symbols, cached = convertCached(sourcePath, opts, cache, jobs)
+        except ValueError:
+            print 'FAILED', sourcePath + ':', ''.join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
+            sys.exit(1)
+        if cached:
+            print 'Loaded', len(symbols), 'device(s) from cache'
+        else:
+            print 'Converted', len(symbols), 'device(s)'
+        if dedup:
+            symbols, numAliases, saved = dedupSymbols(symbols, opts.outputFormat)
+            reportDedup(numAliases, saved)
+        if not shard == '':
+            reportShards(destPath, writeShards(destPath, symbols, shard, opts.outputFormat))
+        elif destNew:
+            writeLibrary(destPath, symbols, opts.outputFormat)
+        else:
+            added, replaced, skipped, dropped = updateLibrary(destPath, symbols, opts.outputFormat)
+            print 'Updated library:', added, 'added,', replaced, 'replaced,', skipped, 'unchanged,', dropped, 'duplicates removed.'
+        print 'Export successful!'
+        return
+
+    if prof is not None:
+        prof.path = sourcePath
+    # write into library, one device after the other as the parser finishes them
+    # (all of them are kept to update an existing library or to find duplicates)
+    stream = destNew and not dedup and shard == ''
+    if stream:
+        out = openLibrary(destPath)
+    else:
+        symbols = []
+
+    FPID = 1
+    try:
+        for name, txt, numGroups, numPins in convertDevices(pinoutLines(sourcePath), opts, jobs, prof):
+            print 'Calculated Layout of device', FPID, '(' + name + ')'
+            if stream:
+                if FPID == 1:
+                    out.write(libFormats[opts.outputFormat].header)
+                out.write(txt)
+            else:
+                symbols.append((name, txt))
+            print '... done.', numGroups, 'pin groups and', numPins, 'pins found.' 
+            FPID += 1
+        if FPID == 1:
+            raise ValueError('no pin table found')
+    except ValueError:
+        # same as a failed file of a batch, nothing is written
+        if stream:
+            out.discard()
+        print 'FAILED', sourcePath + ':', ''.join(traceback.format_exception_only(*sys.exc_info()[:2])).strip()
+        sys.exit(1)
+    except:
+        if stream:
+            out.discard()
+        raise
 
+    if dedup:
+        symbols, numAliases, saved = dedupSymbols(symbols, opts.outputFormat)
+        reportDedup(numAliases, saved)
+    if stream:
+        out.write(libFormats[opts.outputFormat].footer)
+        out.commit()
+    elif not shard == '':
+        reportShards(destPath, writeShards(destPath, symbols, shard, opts.outputFormat))
+    elif destNew:
+        writeLibrary(destPath, symbols, opts.outputFormat)
+    else:
+        added, replaced, skipped, dropped = updateLibrary(destPath, symbols, opts.outputFormat)
+        print 'Updated library:', added, 'added,', replaced, 'replaced,', skipped, 'unchanged,', dropped, 'duplicates removed.'
+    print 'Export successful!'
+    reportProfile(prof, profPath)
 
 
+if __name__ == '__main__':
+    main(sys.argv)
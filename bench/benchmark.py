@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+# times parse, layout and emit separately on synthetic pinouts, best of n runs, results as json
+# usage: python bench/benchmark.py [--sizes 500,2000,5000,10000] [--repeat N] [--banks N] [--groups N]
+#                                  [--packages N] [--seed N] [--format lib|kicad_sym] [<output json>]
+
+import sys
+import os.path
+import time
+import json
+import platform
+from cStringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import altera2eeschema
+from genpinout import genPinout
+
+
+sizes = [500, 2000, 5000, 10000]
+repeat = 3
+outputFormat = 'lib'
+
+
+class NullSink(object):
+    # counts the output instead of keeping it, emit time without the cost of a growing buffer
+    def __init__(self):
+        self.size = 0
+
+    def write(self, txt):
+        self.size += len(txt)
+
+
+def best(func, n):
+    times = []
+    for run in range(n):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def benchPinout(data, opts, n):
+    result = {}
+    parsed = []
+
+    def parse():
+        del parsed[:]
+        parsed.extend(altera2eeschema.parsePinout(StringIO(data), opts))
+    result['parse'] = best(parse, n)
+    device, FPs = parsed
+
+    layouts = []
+
+    def layout():
+        del layouts[:]
+        for fp in FPs:
+            layouts.append(altera2eeschema.layoutSymbol(fp, opts))
+    result['layout'] = best(layout, n)
+
+    sink = NullSink()
+
+    def emit():
+        sink.size = 0
+        for fp, lay in zip(FPs, layouts):
+            altera2eeschema.writeSymbol(sink, device, fp, lay, opts)
+    result['emit'] = best(emit, n)
+
+    result['devices'] = len(FPs)
+    result['groups'] = sum(len(fp.pinGroups) for fp in FPs)
+    result['bytes'] = sink.size
+    return result
+
+
+def runBenchmarks(sizes, n, fmt, **genArgs):
+    results = []
+    for pins in sizes:
+        buf = StringIO()
+        genPinout(buf, pins=pins, **genArgs)
+        data = buf.getvalue()
+        for singleGroups in [False, True]:
+            opts = altera2eeschema.Options(singleGroups=singleGroups, outputFormat=fmt)
+            result = benchPinout(data, opts, n)
+            result['pins'] = pins
+            result['singleGroups'] = singleGroups
+            results.append(result)
+            print >> sys.stderr, '{:>6} pins {:<7} parse {:.4f}s layout {:.4f}s emit {:.4f}s'.format(
+                pins, 'single' if singleGroups else 'block', result['parse'], result['layout'], result['emit'])
+    return results
+
+
+if __name__ == '__main__':
+    genArgs = {}
+    outPath = ''
+    idx = 1
+    while idx < len(sys.argv):
+        arg = sys.argv[idx]
+        if arg == '--sizes' and idx < len(sys.argv) - 1:
+            sizes = [int(s) for s in sys.argv[idx + 1].split(',')]
+            idx += 1
+        elif arg == '--repeat' and idx < len(sys.argv) - 1:
+            repeat = int(sys.argv[idx + 1])
+            idx += 1
+        elif arg == '--format' and idx < len(sys.argv) - 1:
+            outputFormat = sys.argv[idx + 1]
+            idx += 1
+        elif arg in ['--banks', '--groups', '--packages', '--seed'] and idx < len(sys.argv) - 1:
+            genArgs[arg[2:]] = int(sys.argv[idx + 1])
+            idx += 1
+        elif arg.startswith('-'):
+            print 'Unknown option', arg
+            quit()
+        else:
+            outPath = arg
+        idx += 1
+
+    report = {'python': platform.python_version(), 'repeat': repeat, 'generator': genArgs, 'format': outputFormat,
+              'results': runBenchmarks(sizes, repeat, outputFormat, **genArgs)}
+    if outPath == '':
+        print json.dumps(report, indent=2, sort_keys=True)
+    else:
+        out = open(outPath, 'w')
+        json.dump(report, out, indent=2, sort_keys=True)
+        out.close()
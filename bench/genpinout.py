@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+# synthetic pinout in the tab separated Altera format, real ones must not be redistributed
+# usage: python bench/genpinout.py [--pins N] [--banks N] [--groups N] [--packages N] [--devices N]
+#                                  [--pwr RATIO] [--clk RATIO] [--nc RATIO] [--seed N] [<output file>]
+
+import sys
+import random
+
+
+ROWS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'J', 'K', 'L', 'M', 'N', 'P', 'R', 'T', 'U', 'V', 'W', 'Y']
+
+# name -> (type, default)
+PARAMS = [('pins', int, 500), ('banks', int, 8), ('groups', int, 0), ('packages', int, 1), ('devices', int, 1),
+          ('pwr', float, 0.2), ('clk', float, 0.02), ('nc', float, 0.02), ('seed', int, 1)]
+
+
+def ballID(idx):
+    # A1, B1, ..., Y1, AA1, AB1, ..., YY1, A2, ...
+    rows = len(ROWS)
+    row = idx % (rows * (rows + 1))
+    col = idx // (rows * (rows + 1)) + 1
+    if row < rows:
+        name = ROWS[row]
+    else:
+        name = ROWS[row // rows - 1] + ROWS[row % rows]
+    return name + str(col)
+
+
+def genPinout(out, pins=500, banks=8, groups=0, packages=1, devices=1, pwr=0.2, clk=0.02, nc=0.02, seed=1):
+    # banks: IO banks 3A, 3B, 4A, ...; groups: extra dedicated pin groups without bank;
+    # packages: package columns, the first one bonds all pins, the others a random subset
+    rnd = random.Random(seed)
+    bankNames = ['{}{}'.format(3 + b // 2, 'AB'[b % 2]) for b in range(banks)]
+    groupNames = ['D{:03d}X'.format(g) for g in range(groups)]
+    pkgNames = ['F{}'.format(256 + 228 * p) for p in range(packages)]
+
+    for dev in range(devices):
+        out.write('"Pin Information for the Cyclone V 5CEBA{} Device Version 2014.01.06"\n'.format(dev + 2))
+        out.write('"Notes (1) through (6). "\n')
+        out.write('Bank Number\tVREF\tPin Name/Function\tOptional Function(s)\tConfiguration Function\t'
+                  'Dedicated Tx/Rx Channel\tEmulated LVDS Output Channel\t' + '\t'.join(pkgNames) +
+                  '\tDQS for X8\tDQS for X16\tDQS for X32\tHMC\n')
+        bonded = [None]
+        for p in range(1, packages):
+            bonded.append(set(rnd.sample(range(pins), int(pins * (0.6 + 0.4 * p / packages)))))
+        for idx in range(pins):
+            bank = bankNames[rnd.randrange(banks)]
+            r = rnd.random()
+            if r < pwr / 2:
+                func = rnd.choice(['GND', 'GND', 'GND', 'VSS_AUX'])
+                bank = ''
+            elif r < pwr:
+                func = rnd.choice(['VCC', 'VCCIO' + bank, 'VCCPD' + bank, 'VCCAUX', 'VCCPGM', 'VREFB' + bank + 'N0'])
+                bank = ''
+            elif r < pwr + clk:
+                func = 'CLK{}{}'.format(rnd.randrange(12), rnd.choice('pn'))
+            elif r < pwr + clk + nc:
+                func = 'NC'
+                bank = ''
+            elif len(groupNames) > 0 and r < pwr + clk + nc + (1 - pwr - clk - nc) * 0.1:
+                func = rnd.choice(groupNames)
+                bank = ''
+            else:
+                func = 'IO'
+            ids = []
+            for p in range(packages):
+                if bonded[p] is None or idx in bonded[p]:
+                    ids.append(ballID(idx))
+                else:
+                    ids.append('')
+            cols = [bank, 'B{}N0'.format(bank) if bank else '', func,
+                    'DIFFIO_RX_L{}{}'.format(idx, rnd.choice('pn')) if func == 'IO' else '',
+                    '', '', ''] + ids + \
+                   ['DQ{}'.format(rnd.randrange(4)) if func == 'IO' else '', '', '', '']
+            out.write('\t'.join(cols) + '\n')
+        out.write('\n')
+        out.write('Notes:\n')
+        out.write('This is a synthetic pinout.\n')
+
+
+if __name__ == '__main__':
+    kwargs = {}
+    outPath = ''
+    types = dict((name, typ) for name, typ, default in PARAMS)
+    idx = 1
+    while idx < len(sys.argv):
+        arg = sys.argv[idx]
+        if arg.startswith('--') and arg[2:] in types and idx < len(sys.argv) - 1:
+            kwargs[arg[2:]] = types[arg[2:]](sys.argv[idx + 1])
+            idx += 1
+        elif arg.startswith('-'):
+            print 'Unknown option', arg
+            quit()
+        else:
+            outPath = arg
+        idx += 1
+    if outPath == '':
+        genPinout(sys.stdout, **kwargs)
+    else:
+        out = open(outPath, 'w')
+        genPinout(out, **kwargs)
+        out.close()
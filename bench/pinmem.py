@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+# bytes per pin of the parsed devices, shared objects (interned strings, groups) counted once
+# usage: python bench/pinmem.py <pinout file> [-p]
+
+import sys
+import os.path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import altera2eeschema
+
+
+def pinAttrs(pin):
+    if hasattr(pin, '__dict__'):
+        yield pin.__dict__
+        for val in pin.__dict__.values():
+            yield val
+    for cls in type(pin).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(pin, name):
+                yield getattr(pin, name)
+
+
+def bytesPerPin(FPs):
+    seen = set()
+    total = 0
+    pins = 0
+    for fp in FPs:
+        for pin in fp.pins:
+            pins += 1
+            total += sys.getsizeof(pin)
+            for obj in pinAttrs(pin):
+                if id(obj) not in seen and not isinstance(obj, (int, type(None), altera2eeschema.PinGroup)):
+                    seen.add(id(obj))
+                    total += sys.getsizeof(obj)
+    return float(total) / pins, pins
+
+
+if __name__ == '__main__':
+    opts = altera2eeschema.Options(allPackages='-p' in sys.argv[2:])
+    source = open(sys.argv[1], 'r')
+    device, FPs = altera2eeschema.parsePinout(source, opts)
+    source.close()
+    perPin, pins = bytesPerPin(FPs)
+    print '{} pins in {} device(s): {:.1f} bytes per pin'.format(pins, len(FPs), perPin)